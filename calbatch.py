@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+'''
+Render a batch of calplot figures in a single process.
+
+The manifest is a JSON list of plot jobs with the same type, ytitle, xtitle,
+opts, input and output fields that calplot.generatePlotCommand consumes.
+'''
+
+import io
+import json
+import time
+from contextlib import redirect_stdout
+from optparse import OptionParser
+
+import calplot
+from calplotCore import fatal
+
+JOB_FIELDS = ["type", "ytitle", "xtitle", "opts", "input", "output"]
+
+
+def parseArgs():
+    parser = OptionParser(usage="calbatch.py [options] MANIFEST [MANIFEST ...]")
+
+    parser.add_option("--quiet", action="store_true", dest="quiet", default=False, help="Only print failed jobs and the summary")
+    parser.add_option("--jobs", action="store", dest="jobs", type="int", default=1, help="Render the plots in parallel with this many worker processes")
+    parser.add_option("--text-engine", action="store", dest="textEngine", type="string", default="", help="Default text engine for jobs that do not set --text-engine")
+    parser.add_option("--tex-cache", action="store", dest="texCache", type="string", default="", help="Default LaTeX snippet cache directory for jobs that do not set --tex-cache")
+    parser.add_option("--print-commands", action="store_true", dest="printCommands", default=False, help="Print the equivalent calplot.py command lines instead of plotting")
+
+    opts, args = parser.parse_args()
+
+    if args == []:
+        fatal("The name of at least one manifest file needs to be supplied")
+
+    if opts.jobs < 1:
+        fatal("The number of jobs must be at least 1")
+
+    return opts, args
+
+
+def readManifest(filename):
+    try:
+        with open(filename) as f:
+            jobs = json.load(f)
+    except OSError:
+        fatal(f"Cannot open manifest {filename}")
+    except ValueError as e:
+        fatal(f"Could not parse manifest {filename}: {e}")
+
+    if not isinstance(jobs, list):
+        fatal(f"Manifest {filename} must contain a list of plot jobs")
+    return jobs
+
+
+def checkJob(job):
+    if not isinstance(job, dict):
+        raise Exception("Plot job must be a dictionary")
+    missing = [f for f in JOB_FIELDS if f not in job]
+    if missing != []:
+        raise Exception(f"Plot job is missing the field(s) {', '.join(missing)}")
+
+
+def batchDefaultArgs(opts):
+    args = []
+    if opts.textEngine != "":
+        args += ["--text-engine", opts.textEngine]
+    if opts.texCache != "":
+        args += ["--tex-cache", opts.texCache]
+    return args
+
+
+def runPlotArgs(args):
+    '''
+    Run calplot with these command line arguments in this process. Returns a
+    (success, output) pair where output holds everything calplot printed.
+    '''
+    output = io.StringIO()
+    success = False
+    try:
+        with redirect_stdout(output):
+            calplot.main(args)
+        success = True
+    except SystemExit:
+        pass
+    except Exception as e:
+        output.write(f"\nERROR: {type(e).__name__}: {e}\n")
+
+    return success, output.getvalue()
+
+
+def runPlotJob(job, defaultArgs=[]):
+    try:
+        checkJob(job)
+    except Exception as e:
+        return False, f"\nERROR: {e}\n"
+    return runPlotArgs(defaultArgs + calplot.generatePlotArgs(job))
+
+
+def timedPlotJob(job, defaultArgs=[]):
+    start = time.perf_counter()
+    success, output = runPlotJob(job, defaultArgs)
+    return success, output, time.perf_counter() - start
+
+
+def initWorker():
+    import matplotlib
+    from calplotCore.plot import setUpMatplotlib
+
+    matplotlib.use("Agg")
+    setUpMatplotlib()
+
+
+def jobName(job):
+    if isinstance(job, dict) and "output" in job:
+        return job["output"]
+    return "<invalid job>"
+
+
+def reportJob(index, numJobs, job, result, quiet):
+    success, output, elapsed = result
+    if not quiet or not success:
+        status = "done" if success else "FAILED"
+        print(f"[{index + 1}/{numJobs}] {jobName(job)}: {status} ({elapsed:.2f} s)")
+    if not success:
+        print(output.strip())
+
+
+def runBatch(jobs, quiet=False, workers=1, defaultArgs=[]):
+    '''
+    Render all jobs and return the ones that failed, in manifest order. With
+    more than one worker, the jobs are spread over a pool of processes that
+    each set up matplotlib once and then render jobs until the batch is done.
+    '''
+    results = [None] * len(jobs)
+    if workers == 1:
+        for i in range(len(jobs)):
+            results[i] = timedPlotJob(jobs[i], defaultArgs)
+            reportJob(i, len(jobs), jobs[i], results[i], quiet)
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from concurrent.futures.process import BrokenProcessPool
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=initWorker) as pool:
+            futures = {pool.submit(timedPlotJob, jobs[i], defaultArgs): i for i in range(len(jobs))}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except BrokenProcessPool as e:
+                    results[i] = (False, f"ERROR: Worker process died: {e}", 0.0)
+                reportJob(i, len(jobs), jobs[i], results[i], quiet)
+
+    return [jobs[i] for i in range(len(jobs)) if not results[i][0]]
+
+
+def main():
+    opts, args = parseArgs()
+
+    jobs = []
+    for filename in args:
+        jobs += readManifest(filename)
+
+    if opts.printCommands:
+        for job in jobs:
+            try:
+                checkJob(job)
+            except Exception as e:
+                fatal(str(e))
+            print(calplot.generatePlotCommand(job))
+        return
+
+    start = time.perf_counter()
+    failed = runBatch(jobs, opts.quiet, opts.jobs, batchDefaultArgs(opts))
+    print(f"Rendered {len(jobs) - len(failed)} of {len(jobs)} plots in {time.perf_counter() - start:.1f} s")
+
+    if failed != []:
+        fatal(f"{len(failed)} plot job(s) failed: {', '.join(jobName(j) for j in failed)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,9 @@ from optparse import OptionParser
 
 from calplotCore import fatal, warn, numberToString, isInt, NO_DATA_STRING, TYPED_WORKLOAD_IDENTIFIERS, ERROR_STRING
 from calplotCore.io import readFilesForMerge, printData
+from calplotCore.workload import canonicalWorkloadKey, workloadType
+
+JOIN_TYPES = ["inner", "outer"]
 
 
 def parseArgs():
@@ -32,6 +35,10 @@ def parseArgs():
     parser.add_option("--sort-cols", action="store_true", dest="sortCols", default=False, help="Sort each column in ascending order")
     parser.add_option("--sort-after-column", action="store", dest="sortAfterCol", type="int", default=-1, help="Sort the rows after the values of the specified column")
     parser.add_option("--pure-merge", action="store_true", dest="pureMerge", default=False, help="Blindly merge line by line, discarding indentifier")
+    parser.add_option("--jobs", action="store", dest="jobs", type="int", default=1, help="Read the input files in parallel with this many processes")
+    parser.add_option("--join", action="store", dest="join", type="string", default="inner", help=f"Keep only rows present in all files (inner) or pad missing values with {NO_DATA_STRING} (outer)")
+    parser.add_option("--cache-dir", action="store", dest="cacheDir", type="string", default="", help="Cache parsed input files in this directory")
+    parser.add_option("--cache-size", action="store", dest="cacheSize", type="int", default=1024, help="Maximum size of the parse cache in MB (Default: 1024)")
     parser.add_option("--split-wl-types", action="store_true", dest="splitWlTypes", default=False, help="Split results into one column per workload")
 
     opts, args = parser.parse_args()
@@ -58,95 +65,78 @@ def parsePrintSpec(opts):
     return mergeSpec
 
 
-def mergeData(fileData, pureMerge, disableRowSort):
+def mergeData(fileData, pureMerge, disableRowSort, join="inner", quiet=False):
+
+    if join not in JOIN_TYPES:
+        fatal(f"Join type needs to be one of {JOIN_TYPES}")
 
     totalHeaders = [""]
-    mergedData = {}
     columnToFileList = []
+    fileWidths = []
+    lineIndex = {}
 
-    maxVals = 0
-    curPrefix = []
-    lineOrder = []
-    for headers, values, numVals, filename in fileData:
-        maxVals += numVals - 1
+    for fileID in range(len(fileData)):
+        headers, values, numVals, filename = fileData[fileID]
+        fileWidths.append(numVals - 1)
 
         if len(headers) == numVals:
             headers = headers[1:]
 
-        for h in headers:
-            totalHeaders.append(h)
-            columnToFileList.append(filename)
+        totalHeaders += headers
+        columnToFileList += [filename for h in headers]
 
         lineIdent = 1
         for v in values:
             assert len(v) == numVals
 
             if pureMerge:
-                wl = str(lineIdent)
+                linekey = str(lineIdent)
                 lineIdent += 1
             else:
-                wltypes = "".join(TYPED_WORKLOAD_IDENTIFIERS)
-                match = re.search("fair[0-9][0-9]", v[0])
-
-                if match is None:
-                    match = re.search(f"[0-9]+-t-[{wltypes}]-[0-9]+-sp0-.*", v[0])
-
-                if match is None:
-                    match = re.search(f"[0-9]+-t-[{wltypes}]-[0-9]+", v[0])
-
-                if match is None:
-                    match = re.search(f"t-[{wltypes}]-[0-9]*-[0-9].*\S", v[0])
-
-                if match is not None:
-                    wl = match.group()
-                    wlsections = wl.split("-")
-                    if len(wlsections) == 4:
-                        wlnum = int(wlsections[3])
-                        wlnumstr = str(wlnum)
-                        if wlnum < 10:
-                            wlnumstr = f"0{wlnum}"
-                        wl = f'{"-".join(wlsections[0:3])}-{wlnumstr}'
-                else:
-                    wl = v[0]
-
-            sp = False
-            linekey = wl
-            if linekey not in lineOrder:
-                lineOrder.append(linekey)
-            if sp:
-                linekey = f"{wl}-{sp}"
-
-            if linekey not in mergedData:
-                mergedData[linekey] = [c for c in curPrefix]
+                linekey = canonicalWorkloadKey(v[0])
 
-            for val in v[1:]:
-                mergedData[linekey].append(val)
+            fileSlots = lineIndex.get(linekey)
+            if fileSlots is None:
+                fileSlots = [None for f in fileData]
+                lineIndex[linekey] = fileSlots
 
-        if pureMerge:
-            curPrefix += [NO_DATA_STRING for i in range(len(headers))]
-
-            for i in mergedData:
-                if len(mergedData[i]) != len(totalHeaders) - 1:
-                    while len(mergedData[i]) != len(totalHeaders) - 1:
-                        mergedData[i].append(NO_DATA_STRING)
+            if fileSlots[fileID] is None:
+                fileSlots[fileID] = v[1:]
+            else:
+                fileSlots[fileID] = fileSlots[fileID] + v[1:]
 
-        for l in mergedData:
-            assert len(mergedData[l]) == len(totalHeaders) - 1
+    maxVals = sum(fileWidths)
+    assert len(totalHeaders) - 1 == maxVals
+    padMissing = pureMerge or join == "outer"
 
-    wls = sorted(mergedData.keys())
+    wls = sorted(lineIndex.keys())
     if disableRowSort:
-        wls = lineOrder
+        wls = list(lineIndex.keys())
 
     mergedMatrix = []
     mergedMatrix.append(totalHeaders)
 
+    dropped = 0
     for wl in wls:
-        if len(mergedData[wl]) == maxVals:
-            line = [wl]
-            for v in mergedData[wl]:
-                line.append(v)
-
+        line = [None] * (maxVals + 1)
+        line[0] = wl
+        pos = 1
+        for fileID, fileValues in enumerate(lineIndex[wl]):
+            if fileValues is None:
+                if not padMissing:
+                    continue
+                fileValues = [NO_DATA_STRING] * fileWidths[fileID]
+
+            line[pos:pos + len(fileValues)] = fileValues
+            pos += len(fileValues)
+
+        if pos == maxVals + 1:
             mergedMatrix.append(line)
+        else:
+            dropped += 1
+
+    if dropped > 0 and not quiet:
+        warn(f"Dropped {dropped} rows that do not have exactly one value for each column (see --join)")
 
     return mergedMatrix, columnToFileList
 
@@ -297,7 +287,7 @@ def computeTypedAverage(processedData, justify, opts):
         typedData = [0.0 for i in range(datalen)]
         lines = 0.0
         for l in processedData:
-            if re.search(f"-{t}-", l[0]):
+            if workloadType(l[0]) == t:
                 for i in range(datalen):
                     try:
                         typedData[i] += float(l[i + 1])
@@ -329,12 +319,8 @@ def splitWlTypes(processedData):
     tmpdata = {}
     linecnt = 0
     for l in processedData[1:]:
-        wltype = ""
-        for t in TYPED_WORKLOAD_IDENTIFIERS:
-            match = re.search(f"-{t}-", l[0])
-            if match is not None:
-                wltype = t
-        assert wltype != ""
+        wltype = workloadType(l[0])
+        assert wltype in TYPED_WORKLOAD_IDENTIFIERS
 
         if wltype not in tmpdata:
             tmpdata[wltype] = {}
@@ -511,8 +497,13 @@ def main():
         if not os.path.exists(filename):
             fatal(f"File {filename} does not exist!")
 
-    fileData = readFilesForMerge(args, opts.separator, opts.columnPrefix, opts.quiet)
-    mergedData, columnToFileList = mergeData(fileData, opts.pureMerge, opts.disableRowSort)
+    cache = None
+    if opts.cacheDir != "":
+        from calplotCore.cache import FileCache
+        cache = FileCache(opts.cacheDir, opts.cacheSize << 20)
+
+    fileData = readFilesForMerge(args, opts.separator, opts.columnPrefix, opts.quiet, opts.jobs, cache)
+    mergedData, columnToFileList = mergeData(fileData, opts.pureMerge, opts.disableRowSort, opts.join, opts.quiet)
 
     if opts.printColumnNames:
         printNames(mergedData, columnToFileList)
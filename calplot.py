@@ -6,13 +6,19 @@ Created on May 15, 2018
 @author: jahre
 '''
 
+import os
+import shlex
+import sys
 from optparse import OptionParser
-from calplotCore import fatal
-from calplotCore.io import readDataFile, createDataSeries
-from calplotCore.plot import boxPlot, plotLines, barChart, violinPlot, scatterPlot
 
+from calplotCore import fatal, setTexCache, TEXT_ENGINES
+from calplotCore.io import readDataTable, readColumnSketches, readSampledColumns, readSampledTable, fixWorkloadNames
 
-def parseArgs():
+STREAMING_PLOT_TYPES = ["boxes", "violin"]
+SAMPLED_PLOT_TYPES = ["boxes", "violin", "scatter"]
+
+
+def parseArgs(argv=None):
     parser = OptionParser(usage="calplot.py [options] filename")
 
     plotTypes = ["boxes", "lines", "bars", "violin", "scatter"]
@@ -38,7 +44,9 @@ def parseArgs():
     parser.add_option("--figure-width", action="store", dest="figwidth", type="float", default=16.0, help="Plot with custom width")
     parser.add_option("--rotate", action="store", dest="rotate", type="string", default="horizontal", help="Rotate the x-axis captions")
     parser.add_option("--datalabels", action="store", dest="datalabels", type="string", default="", help="Show data values on selected bars (Format: seriesindex,valueindex,decimals[: ... ])")
-    parser.add_option("--mark-every", action="store", dest="markEvery", type="int", default=1, help="Mark every nth data point in a line plot (default is 1)")
+    parser.add_option("--no-point-legend", action="store_false", dest="pointLegend", default=True, help="Do not add a legend entry for every point in a scatter plot")
+    parser.add_option("--mark-every", action="store", dest="markEvery", type="int", default=1, help="Mark every nth data point in a line plot, 0 draws no markers (default is 1)")
+    parser.add_option("--downsample", action="store_true", dest="downsample", default=False, help="Only draw the smallest and largest value per pixel column of a line plot (useful for very long series)")
     parser.add_option("--large-fonts", action="store_true", dest="largeFonts", default=False, help="Increase the font size (useful for really small plots)")
     parser.add_option("--div-factor", action="store", dest="divFactor", type="float", default=1.0, help="Divide all y values by this constant")
     parser.add_option("--mode", action="store", dest="mode", type="string", default="expand", help="The mode of the legend, set to None to disable expansion")
@@ -46,9 +54,19 @@ def parseArgs():
     parser.add_option("--linemarkers", action="store", dest="linemarkers", type="string", default="", help="Add line markers at these y-values, comma separated")
     parser.add_option("--labels", action="store", dest="labels", type="string", default="", help="Add labels  at these coordinates, x,y,text,rotation[:x,y,text,rotation]")
     parser.add_option("--fill-background", action="store", dest="fillBackground", type="string", default="", help="Fill the background between x-ranges x1,x2[:xi,yj]")
+    parser.add_option("--chunk-rows", action="store", dest="chunkRows", type="int", default=0, help="Stream the data file in chunks of this many rows (box plots, and violin plots with --sample). Box plots then use approximate quartiles and outliers computed from a fixed-size sketch of each column. Violin plots need every value in memory, so they are only streamed together with --sample")
+    parser.add_option("--sample", action="store", dest="sample", type="int", default=0, help="Plot a reproducible random sample of at most this many values per column (box and violin plots) or rows per workload type (scatter plots)")
+    parser.add_option("--jobs", action="store", dest="jobs", type="int", default=1, help="Parse the data file in parallel with this many processes")
+    parser.add_option("--cache-dir", action="store", dest="cacheDir", type="string", default="", help="Cache parsed input files and violin plot densities in this directory")
+    parser.add_option("--cache-size", action="store", dest="cacheSize", type="int", default=1024, help="Maximum size of the parse cache in MB (Default: 1024)")
+    parser.add_option("--render-cache", action="store", dest="renderCache", type="string", default="", help="Reuse plots rendered earlier from the same data and options, cached in this directory")
+    parser.add_option("--render-cache-size", action="store", dest="renderCacheSize", type="int", default=1024, help="Maximum size of the render cache in MB (Default: 1024)")
+    parser.add_option("--text-engine", action="store", dest="textEngine", type="string", default="usetex", help=f"Text rendering engine (Default: usetex, alternatives {TEXT_ENGINES}). mathtext avoids running LaTeX.")
+    parser.add_option("--tex-cache", action="store", dest="texCache", type="string", default="", help="Directory for rendered LaTeX snippets, can be shared between runs. It becomes matplotlib's configuration and cache directory (MPLCONFIGDIR), so calplotd only accepts the directory it was started with")
+    parser.add_option("--daemon-socket", action="store", dest="daemonSocket", type="string", default=os.environ.get("CALPLOT_DAEMON_SOCKET", ""), help="Forward the plot to the calplotd render daemon listening on this socket (Default: $CALPLOT_DAEMON_SOCKET)")
     parser.add_option("--num-yticks", action="store", dest="numYTicks", type="int", default=-1, help="Force N y-axis tick marks and labels.")
 
-    opts, args = parser.parse_args()
+    opts, args = parser.parse_args(argv)
 
     datafiles = []
     for a in args:
@@ -67,6 +85,18 @@ def parseArgs():
     if opts.plotType not in plotTypes:
         fatal(f"Plot type needs to be one of {plotTypes}")
 
+    if opts.textEngine not in TEXT_ENGINES:
+        fatal(f"Text engine needs to be one of {TEXT_ENGINES}")
+
+    if opts.sample < 0:
+        fatal("The sample size must be positive")
+
+    if opts.sample > 0 and opts.plotType not in SAMPLED_PLOT_TYPES:
+        fatal(f"Sampling is only supported for the plot types {SAMPLED_PLOT_TYPES}")
+
+    if opts.chunkRows > 0 and opts.plotType == "violin" and opts.sample == 0:
+        fatal("Violin plots need every value in memory, use --sample with --chunk-rows to bound it")
+
     if opts.plotType != "boxplot" and len(datafiles) > 1:
         fatal("Plotting of multiple data files only make sense for boxplots")
 
@@ -91,26 +121,83 @@ def generatePlotCommand(data):
     return " ".join(cmd)
 
 
-def main():
-    opts, args, datafiles = parseArgs()
+def generatePlotArgs(data):
+    args = ["--plot-type", data["type"], "-y", data["ytitle"], "-x", data["xtitle"]]
+    args += shlex.split(" ".join(data["opts"]))
+    args += ["--outfile", data["output"], data["input"]]
+    return args
+
+
+def forwardToDaemon(socketPath, argv):
+    from calplotd import sendRequest
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        reply = sendRequest(socketPath, {"cwd": os.getcwd(), "args": argv + ["--daemon-socket", ""]})
+    except OSError as e:
+        print(f"Could not reach calplotd at {socketPath} ({e}), plotting locally")
+        return False
+
+    print(reply["output"], end="")
+    if reply["status"] != 0:
+        sys.exit(reply["status"])
+    return True
+
+
+def main(argv=None):
+    opts, args, datafiles = parseArgs(argv)
+
+    if opts.daemonSocket != "" and opts.outfile is not None:
+        if forwardToDaemon(opts.daemonSocket, argv):
+            for f in datafiles:
+                f.close()
+            return
 
     print("Data file plot script")
 
-    dataseries = []
-    header = []
+    if opts.texCache != "":
+        try:
+            setTexCache(opts.texCache)
+        except Exception as e:
+            fatal(str(e))
+
+    cache = None
+    if opts.cacheDir != "":
+        from calplotCore.cache import FileCache
+        cache = FileCache(opts.cacheDir, opts.cacheSize << 20)
+
+    chunkRows = None
+    if opts.chunkRows > 0:
+        chunkRows = opts.chunkRows
+    streaming = (opts.chunkRows > 0 or opts.sample > 0) and opts.plotType in STREAMING_PLOT_TYPES
+
+    table = None
     for i in range(len(datafiles)):
         print(f"Processing file plot of file {args[i]}")
 
-        header, rawData = readDataFile(datafiles[i], opts.columns, opts.onlyType)
-        dataseries = createDataSeries(rawData, len(header), opts.plotType, opts.fixWls, opts.onlyWlNum)
+        if opts.sample > 0 and streaming:
+            header, columnData = readSampledColumns(datafiles[i], opts.columns, opts.onlyType, opts.sample, chunkRows)
+        elif opts.sample > 0:
+            table = readSampledTable(datafiles[i], opts.columns, opts.onlyType, opts.sample, chunkRows)
+            table = table.withKeys(fixWorkloadNames(list(table.keys), opts.fixWls, opts.onlyWlNum))
+        elif streaming:
+            header, columnData = readColumnSketches(datafiles[i], opts.columns, opts.onlyType, opts.chunkRows)
+        else:
+            table = readDataTable(datafiles[i], opts.columns, opts.onlyType, opts.jobs, cache)
+            table = table.withKeys(fixWorkloadNames(list(table.keys), opts.fixWls, opts.onlyWlNum))
+        datafiles[i].close()
 
     if opts.avg:
-        for i in range(len(dataseries)):
-            if i == 0:
-                dataseries[i].append("AVG")
-            else:
-                avg = float(sum(dataseries[i])) / float(len(dataseries[i]))
-                dataseries[i].append(avg)
+        if streaming and opts.sample == 0 and opts.plotType == "boxes":
+            for sketch in columnData:
+                sketch.add([sketch.mean()])
+        elif streaming:
+            import numpy as np
+            columnData = [np.append(c, np.average(c)) for c in columnData]
+        else:
+            table = table.appendRow("AVG", table.columnAverages())
 
     if opts.outfile is not None:
         print(f"Plotting data to file {opts.outfile}...")
@@ -137,41 +224,50 @@ def main():
                  "labels": opts.labels,
                  "fillBackground": opts.fillBackground,
                  "largeFonts": opts.largeFonts,
+                 "textEngine": opts.textEngine,
                  "numYTicks": opts.numYTicks}
 
+    plotArgs = (table,)
     if opts.plotType == "lines":
-
+        plotName = "plotLines"
         kwargDict["divFactor"] = opts.divFactor
         kwargDict["markEvery"] = opts.markEvery
-
-        plotLines(dataseries[0], dataseries[1:],
-                  titles=header,
-                  **kwargDict)
+        kwargDict["downsample"] = opts.downsample
 
     elif opts.plotType == "bars":
+        plotName = "barChart"
         kwargDict["errorrows"] = opts.errorrows
         kwargDict["errorcols"] = opts.errorcols
 
-        barChart(dataseries[0],
-                 dataseries[1:],
-                 header,
-                 **kwargDict)
-
     elif opts.plotType == "violin":
-        violinPlot(header,
-                   dataseries[1:],
-                   **kwargDict)
+        plotName = "violinPlot"
+        if streaming:
+            plotArgs = (header, columnData)
+        if cache is not None:
+            kwargDict["statsCache"] = cache
 
     elif opts.plotType == "scatter":
-        scatterPlot(dataseries[1],
-                    dataseries[2],
-                    legend=dataseries[0],
-                    **kwargDict)
+        plotName = "scatterPlot"
+        kwargDict["pointLegend"] = opts.pointLegend
     else:
         assert opts.plotType == "boxes"
-        boxPlot(dataseries[1:],
-                titles=header,
-                **kwargDict)
+        plotName = "boxPlot"
+        if streaming:
+            plotArgs = (columnData,)
+            kwargDict["titles"] = header
+
+    if opts.renderCache != "":
+        from calplotCore.cache import FileCache
+        from calplotCore.rendercache import fetchCachedRender, renderCacheEnabled, renderKey
+        kwargDict["renderCache"] = FileCache(opts.renderCache, opts.renderCacheSize << 20)
+        if renderCacheEnabled(kwargDict) and fetchCachedRender(renderKey(plotName, plotArgs, kwargDict), kwargDict):
+            print("The plot is unchanged and was copied from the render cache")
+            print("Done!")
+            return
+
+    # matplotlib is only loaded once the data has been read
+    from calplotCore import plot
+    getattr(plot, plotName)(*plotArgs, **kwargDict)
 
     print("Done!")
 
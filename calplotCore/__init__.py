@@ -4,11 +4,13 @@ Created on May 15, 2018
 @author: jahre
 '''
 
+import os
 import sys
 
 NO_DATA_STRING = "NoData"
 ERROR_STRING = "N/A"
 TYPED_WORKLOAD_IDENTIFIERS = ["h", "m", "l", "s", "a"]
+TEXT_ENGINES = ["usetex", "mathtext"]
 
 
 def fatal(message):
@@ -20,6 +22,23 @@ def warn(message):
     print(f"WARNING: f{message}")
 
 
+def setTexCache(directory):
+    '''
+    Use this directory as matplotlib's configuration and cache directory
+    (MPLCONFIGDIR), so that the LaTeX snippets rendered by usetex can be
+    shared between runs, processes and machines. matplotlib only reads
+    MPLCONFIGDIR when it is imported, so this has to be called first.
+    '''
+    directory = os.path.abspath(directory)
+    if "matplotlib" in sys.modules:
+        import matplotlib
+        if os.path.realpath(matplotlib.get_cachedir()) != os.path.realpath(directory):
+            raise Exception(f"The LaTeX cache directory cannot be changed to {directory} after matplotlib has been loaded")
+        return
+    os.makedirs(directory, exist_ok=True)
+    os.environ["MPLCONFIGDIR"] = directory
+
+
 def numberToString(number, decimalPlaces):
     if isinstance(number, int):
         return str(number)
@@ -0,0 +1,149 @@
+import functools
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from calplotCore.table import DataTable
+
+DEFAULT_CACHE_BYTES = 1 << 30
+HASH_BLOCK_BYTES = 1 << 20
+PARSER_MODULES = ["io.py", "workload.py", "table.py", "cache.py"]
+
+
+@functools.lru_cache(maxsize=None)
+def sourceDigest(*modules):
+    '''
+    Hash of the source of these calplotCore modules. Cache keys include it so
+    that entries written by an older version of the code are not reused.
+    '''
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(os.path.join(os.path.dirname(__file__), module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class FileCache:
+    '''
+    Directory of cache entries keyed by a hash of the input file (path, size,
+    mtime and content) and the parameters used to process it. The least
+    recently used entries are removed when the directory grows beyond
+    maxBytes.
+    '''
+
+    def __init__(self, directory, maxBytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+    def fileKey(self, path, namespace, params):
+        stat = os.stat(path)
+        digest = hashlib.sha256()
+        digest.update(repr((namespace, sourceDigest(*PARSER_MODULES), os.path.abspath(path), stat.st_size, stat.st_mtime_ns, params)).encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def entryPath(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def lookup(self, key, suffix):
+        path = self.entryPath(key, suffix)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return path
+
+    def store(self, key, suffix, writer):
+        fd, tmppath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+            os.replace(tmppath, self.entryPath(key, suffix))
+        except BaseException:
+            os.remove(tmppath)
+            raise
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        totalBytes = sum(e[1] for e in entries)
+        for mtime, size, name in sorted(entries):
+            if totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            totalBytes -= size
+
+
+def loadCachedTable(cache, key):
+    path = cache.lookup(key, ".npz")
+    if path is None:
+        return None
+
+    with np.load(path, allow_pickle=False) as entry:
+        return DataTable(entry["header"].tolist(), entry["keys"].astype(object), entry["values"], entry["mask"])
+
+
+def storeCachedTable(cache, key, table):
+    cache.store(key, ".npz", lambda f: np.savez(f,
+                                                header=np.array(table.header, dtype=str),
+                                                keys=np.array(list(table.keys), dtype=str),
+                                                values=table.values,
+                                                mask=table.mask))
+
+
+def loadCachedMergeFile(cache, key):
+    path = cache.lookup(key, ".npz")
+    if path is None:
+        return None
+
+    with np.load(path, allow_pickle=False) as entry:
+        numVals = int(entry["numVals"])
+        text = entry["text"].tobytes().decode()
+        ends = np.cumsum(entry["lengths"]).tolist()
+        cells = [text[begin:end] for begin, end in zip([0] + ends[:-1], ends)]
+        rows = [cells[i:i + numVals] for i in range(0, len(cells), numVals)]
+        return entry["head"].tolist(), rows, numVals, entry["warnings"].tolist()
+
+
+def storeCachedMergeFile(cache, key, head, fileRows, numVals, warnings):
+    # The cells are stored as one string and their lengths, a str array
+    # would pad every cell to the length of the longest one
+    cells = [c for row in fileRows for c in row]
+    cache.store(key, ".npz", lambda f: np.savez(f,
+                                                head=np.array(head, dtype=str),
+                                                text=np.frombuffer("".join(cells).encode(), dtype=np.uint8),
+                                                lengths=np.array([len(c) for c in cells], dtype=np.int64),
+                                                numVals=np.array(numVals),
+                                                warnings=np.array(warnings, dtype=str)))
+
+
+def loadCachedViolinStats(cache, key):
+    path = cache.lookup(key, ".npz")
+    if path is None:
+        return None
+
+    with np.load(path, allow_pickle=False) as entry:
+        stats = {name: entry[name] for name in ["coords", "vals"]}
+        for name in ["mean", "median", "min", "max"]:
+            stats[name] = float(entry[name])
+        return stats
+
+
+def storeCachedViolinStats(cache, key, stats):
+    cache.store(key, ".npz", lambda f: np.savez(f, **stats))
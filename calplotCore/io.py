@@ -4,110 +4,574 @@ Created on May 15, 2018
 @author: jahre
 '''
 import csv
+import io
+import mmap
+import os
 import re
+from array import array
+from itertools import chain, islice
+
+# NumPy, the table classes, the parse cache and the process pool are imported
+# by the functions that use them so that table-only commands such as
+# calmerge.py start without loading them.
+
+from calplotCore.workload import workloadType, selectedWorkloadType, readableWorkloadName, workloadNumber
 from calplotCore import fatal, NO_DATA_STRING, warn, normalize, isFloat
 
 redPrefix = '\033[1;31m'
 greenPrefix = '\033[1;32m'
 colorSuffix = '\033[1;m'
 
+NAN = float("nan")
+CHUNK_CELLS = 1 << 20
+DIALECT_SAMPLE_LINES = 10
+WHITESPACE_SEPARATOR = "\\s+"
+SAMPLE_SEED = 0
 
-def readDataFile(datafile, columns, onlyWlType):
-    useCsv = datafile.name.endswith(".csv")
-    if useCsv:
-        datafile = csv.reader(datafile, delimiter=";")
-        header = next(datafile)
-    else:
-        header = datafile.readline().strip().split()
+# NoData is overwritten in place with a NaN field of the same length
+NAN_FIELD = "nan".ljust(len(NO_DATA_STRING)).encode()
+
+# The whitespace characters str.split() separates on outside ASCII
+UNICODE_SPACE = re.compile("[\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]")
+
+
+def detectDelimiter(datafile, sampleLines):
+    if datafile.name.endswith(".csv"):
+        return ";"
+
+    sampleLines = [l for l in sampleLines if not l.isspace()]
+    if len(sampleLines) < 2 or not all(";" in l for l in sampleLines):
+        return None
+
+    if len(set(l.count(";") for l in sampleLines[1:])) == 1:
+        return ";"
+    return None
+
+
+def splitLine(line, delimiter):
+    if delimiter is None:
+        return line.strip().split()
+    return next(csv.reader([line], delimiter=delimiter), [])
 
-    data = []
-    for l in datafile:
-        if useCsv:
-            rawline = l
-        else:
-            rawline = l.strip().split()
+
+def readDataHeader(datafile):
+    sampleLines = list(islice(datafile, DIALECT_SAMPLE_LINES))
+    delimiter = detectDelimiter(datafile, sampleLines)
+
+    header = []
+    if sampleLines != []:
+        header = splitLine(sampleLines[0], delimiter)
+
+    if header == []:
+        fatal(f"Datafile parse error, the file {datafile.name} does not contain a header")
+
+    return header, chain(sampleLines[1:], datafile), delimiter
+
+
+def resolveColumns(columns, header):
+    if columns == "":
+        return list(range(len(header)))
+
+    try:
+        includelist = set(float(s) for s in columns.split(","))
+    except ValueError:
+        fatal(f"Cannot parse column specification {columns}")
+
+    return [i for i in range(len(header)) if i in includelist]
+
+
+def splitFields(text, delimiter):
+    '''
+    Find the fields of every line of text, a uint8 array of UTF-8 text that
+    ends with a newline, the way splitLine does without a Python loop per
+    line. Returns the start and end offsets of the fields, the offset of
+    each line and the index of the first field and the number of fields of
+    each line.
+    '''
+    import numpy as np
+
+    newlines = np.flatnonzero(text == ord("\n"))
+    if delimiter is None:
+        # str.split() separates on space, \t to \r and \x1c to \x1f, other
+        # control characters are part of the fields
+        inField = text > 32
+        if np.count_nonzero(text < 32) > len(newlines):
+            controls = np.flatnonzero(text < 32)
+            inField[controls[(text[controls] < 9) | ((text[controls] > 13) & (text[controls] < 28))]] = True
+
+        # The text ends with a newline, so every field has an end
+        edges = np.flatnonzero(inField[1:] != inField[:-1]) + 1
+        if inField[0]:
+            edges = np.concatenate(([0], edges))
+        starts = edges[0::2]
+        ends = edges[1::2]
+    else:
+        ends = np.flatnonzero((text == ord(delimiter)) | (text == ord("\n")))
+        starts = np.concatenate(([0], ends[:-1] + 1))
+
+    lineStarts = np.concatenate(([0], newlines[:-1] + 1))
+    firstField = np.searchsorted(starts, lineStarts)
+    numFields = np.diff(firstField, append=len(starts))
+    return starts, ends, lineStarts, firstField, numFields
+
+
+def findFields(text, starts, lengths, token):
+    import numpy as np
+
+    candidates = np.flatnonzero(lengths == len(token))
+    chars = text[starts[candidates, np.newaxis] + np.arange(len(token))]
+    return candidates[(chars == np.frombuffer(token, dtype=np.uint8)).all(axis=1)]
+
+
+def selectFields(chars, starts, ends, rowFields, columns, delimiter):
+    '''
+    Copy the columns of the rows whose keys are the fields rowFields into a
+    new text with one line per row, so that loadtxt does not tokenise the
+    other fields. The columns must be in increasing order, and adjacent
+    columns are copied as one span.
+    '''
+    import numpy as np
+
+    runStarts = np.flatnonzero(np.diff(columns, prepend=-1) != 1)
+    runEnds = np.append(runStarts[1:], len(columns)) - 1
+    spanStarts = starts[rowFields[:, np.newaxis] + columns[runStarts]].ravel()
+    spanLengths = ends[rowFields[:, np.newaxis] + columns[runEnds]].ravel() - spanStarts + 1
+    offsets = np.cumsum(spanLengths) - spanLengths
+    selected = chars[np.repeat(spanStarts - offsets, spanLengths) + np.arange(offsets[-1] + spanLengths[-1])]
+
+    # Each span is copied with the character after it, which becomes the
+    # separator or the end of the line
+    separators = (offsets + spanLengths - 1).reshape(len(rowFields), len(runStarts))
+    selected[separators] = ord(" " if delimiter is None else delimiter)
+    selected[separators[:, -1]] = ord("\n")
+    return selected
+
+
+def parseDataRows(lines, header, delimiter, onlyWlType, includeIndexes):
+    import numpy as np
+    from calplotCore.table import DataTable
+
+    # Fields are found in the UTF-8 bytes, which splits like str.split()
+    # unless the text has non-ASCII whitespace. Quoted CSV is left to the
+    # per-cell parser.
+    data = "".join(lines)
+    if data == "" or includeIndexes == [] or (delimiter is None and not data.isascii() and UNICODE_SPACE.search(data) is not None) or \
+            (delimiter is not None and ('"' in data or "\r" in data)):
+        return parseDataRowsPerCell(lines, header, delimiter, onlyWlType, includeIndexes)
+    if not data.endswith("\n"):
+        data += "\n"
+
+    raw = data.encode()
+    text = np.frombuffer(raw, dtype=np.uint8)
+    starts, ends, lineStarts, firstField, numFields = splitFields(text, delimiter)
+    if len(lineStarts) != len(lines):
+        return parseDataRowsPerCell(lines, header, delimiter, onlyWlType, includeIndexes)
+
+    lengths = ends - starts
+    skip = numFields == 0
+    if delimiter is not None:
+        for i in np.flatnonzero(numFields == 1):
+            skip[i] = raw[starts[firstField[i]]:ends[firstField[i]]].isspace() or lengths[firstField[i]] == 0
+    errorFields = np.concatenate((findFields(text, starts, lengths, b"N/A"), findFields(text, starts, lengths, b"RM")))
+    skip[np.searchsorted(firstField, errorFields, side="right") - 1] = True
+
+    # Rows with the wrong number of fields are left to the per-cell parser,
+    # which reports them
+    rows = np.flatnonzero(~skip)
+    if (numFields[rows] != len(header) + 1).any():
+        return parseDataRowsPerCell(lines, header, delimiter, onlyWlType, includeIndexes)
+
+    keyFields = firstField[rows]
+    if data.isascii():
+        keys = [data[s:e] for s, e in zip(starts[keyFields].tolist(), ends[keyFields].tolist())]
+    else:
+        keys = [raw[s:e].decode() for s, e in zip(starts[keyFields].tolist(), ends[keyFields].tolist())]
+    if onlyWlType != "":
+        selected = [i for i in range(len(keys)) if selectedWorkloadType(keys[i]) == onlyWlType]
+        rows = rows[selected]
+        keys = [keys[i] for i in selected]
+    if len(rows) == 0:
+        return parseDataRowsPerCell([], header, delimiter, onlyWlType, includeIndexes)
+
+    # NoData fields are read as NaN and masked if they are in the selected
+    # rows and columns
+    columns = np.array(includeIndexes) + 1
+    mask = np.zeros((len(rows), len(columns)), dtype=bool)
+    chars = text
+    missing = findFields(text, starts, lengths, NO_DATA_STRING.encode())
+    if len(missing) > 0:
+        chars = text.copy()
+        chars[starts[missing, np.newaxis] + np.arange(len(NO_DATA_STRING))] = np.frombuffer(NAN_FIELD, dtype=np.uint8)
+
+        missingLines = np.searchsorted(firstField, missing, side="right") - 1
+        rowIndexes = np.searchsorted(rows, missingLines)
+        selected = rowIndexes < len(rows)
+        selected[selected] = rows[rowIndexes[selected]] == missingLines[selected]
+        columnIndexes = np.full(len(header) + 1, -1)
+        columnIndexes[columns] = np.arange(len(columns))
+        columnIndexes = columnIndexes[missing[selected] - firstField[missingLines[selected]]]
+        mask[rowIndexes[selected][columnIndexes >= 0], columnIndexes[columnIndexes >= 0]] = True
+
+    if len(columns) < len(header):
+        chars = selectFields(chars, starts, ends, firstField[rows], columns, delimiter)
+    elif len(rows) < len(lineStarts):
+        keepLines = np.zeros(len(lineStarts), dtype=bool)
+        keepLines[rows] = True
+        chars = chars[np.repeat(keepLines, np.diff(lineStarts, append=len(text)))]
+
+    try:
+        if chars is not text:
+            data = chars.tobytes().decode()
+        values = np.loadtxt(io.StringIO(data), dtype=np.float64, delimiter=delimiter, comments=None,
+                            usecols=None if len(columns) < len(header) else columns, ndmin=2)
+    except ValueError:
+        return parseDataRowsPerCell(lines, header, delimiter, onlyWlType, includeIndexes)
+
+    if values.shape != mask.shape:
+        return parseDataRowsPerCell(lines, header, delimiter, onlyWlType, includeIndexes)
+
+    return DataTable([header[i] for i in includeIndexes], keys, values, mask)
+
+
+def parseDataRowsPerCell(lines, header, delimiter, onlyWlType, includeIndexes):
+    import numpy as np
+    from calplotCore.table import DataTable
+
+    fieldIndexes = [i + 1 for i in includeIndexes]
+    keys = []
+    values = array("d")
+    mask = bytearray()
+    for l in lines:
+        rawline = splitLine(l, delimiter)
 
         if rawline == []:
             continue
-        tmp = [rawline[0]]
 
-        error = False
-        for e in rawline[1:]:
-            if e == "N/A":
-                error = True
-                continue
-            elif e == "RM":
-                error = True
-                continue
-            elif e == NO_DATA_STRING:
-                tmp.append(None)
+        if "N/A" in rawline or "RM" in rawline:
+            continue
+
+        if len(rawline) - 1 != len(header):
+            fatal(f"Datafile parse error, header has length {len(header)}, data length is {len(rawline)}")
+
+        if onlyWlType != "" and selectedWorkloadType(rawline[0]) != onlyWlType:
+            continue
+
+        for i in fieldIndexes:
+            e = rawline[i]
+            if e == NO_DATA_STRING:
+                values.append(NAN)
+                mask.append(1)
                 continue
 
             try:
-                tmp.append(float(e))
+                values.append(float(e))
             except Exception:
                 fatal(f"Parse error, cannot convert {e} to float")
+            mask.append(0)
+
+        keys.append(rawline[0])
+
+    return DataTable([header[i] for i in includeIndexes], keys, np.frombuffer(values, dtype=np.float64), np.frombuffer(mask, dtype=np.uint8))
+
+
+def defaultChunkRows(header):
+    return max(1, CHUNK_CELLS // (len(header) + 1))
+
+
+def iterParsedChunks(lines, header, delimiter, onlyWlType, includeIndexes, chunkRows):
+    while True:
+        chunkLines = list(islice(lines, chunkRows))
+        if chunkLines == []:
+            break
+
+        table = parseDataRows(chunkLines, header, delimiter, onlyWlType, includeIndexes)
+        if len(table) == 0:
+            continue
+
+        yield table
+
+
+def iterDataChunks(datafile, columns, onlyWlType, chunkRows=None):
+    header, lines, delimiter = readDataHeader(datafile)
+    if chunkRows is None:
+        chunkRows = defaultChunkRows(header)
+
+    includeIndexes = resolveColumns(columns, header)
+
+    foundData = False
+    for table in iterParsedChunks(lines, header, delimiter, onlyWlType, includeIndexes, chunkRows):
+        foundData = True
+        yield table
+
+    if not foundData:
+        fatal("Datafile parse error, the file does not contain any data rows")
 
-        if not error:
-            if onlyWlType != "":
-                wlString = tmp[0].split("-")
-                if wlString[1] != onlyWlType:
-                    continue
 
-            data.append(tmp)
+def splitByteRanges(path, start, jobs):
+    size = os.path.getsize(path)
+    bounds = [start]
+    with open(path, "rb") as f:
+        for i in range(1, jobs):
+            f.seek(max(start + ((size - start) * i) // jobs, bounds[-1]) - 1)
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+    bounds.append(size)
 
-    if len(header) != len(data[0]) - 1:
-        fatal(f"Datafile parse error, header has length {len(header)}, data length is {len(data[0])}")
+    return [(bounds[i], bounds[i + 1]) for i in range(jobs) if bounds[i] < bounds[i + 1]]
 
-    if columns != "":
-        colstrs = columns.split(",")
-        includelist = [float(s) for s in colstrs]
 
-        newheader = []
-        for i in range(len(header)):
-            if i in includelist:
-                newheader.append(header[i])
+def iterMappedLines(path, begin=0, end=None):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
 
-        newdata = []
-        for l in data:
-            newline = [l[0]]
-            for i in range(len(header)):
-                if i in includelist:
-                    newline.append(l[i + 1])
-            newdata.append(newline)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mappedFile:
+            if end is None:
+                end = len(mappedFile)
 
-        return newheader, newdata
+            mappedFile.seek(begin)
+            pos = begin
+            while pos < end:
+                line = mappedFile.readline()
+                if line == b"":
+                    break
+                pos += len(line)
+                yield line.decode()
 
-    return header, data
 
+def headerByteLength(path, lines):
+    with open(path, "rb") as f:
+        return sum(len(f.readline()) for i in range(lines))
 
-def readFilesForMerge(filenames, separator, columnPrefix, quiet):
+
+def parseDataByteRange(path, begin, end, header, delimiter, onlyWlType, includeIndexes):
+    from calplotCore.table import concatenateTables
+
+    lines = iterMappedLines(path, begin, end)
+    tables = list(iterParsedChunks(lines, header, delimiter, onlyWlType, includeIndexes, defaultChunkRows(header)))
+    if tables == []:
+        return None
+    return concatenateTables(tables)
+
+
+def readDataTableParallel(path, columns, onlyWlType, jobs):
+    from concurrent.futures import ProcessPoolExecutor
+    from calplotCore.table import concatenateTables
+
+    with open(path) as datafile:
+        header, lines, delimiter = readDataHeader(datafile)
+    includeIndexes = resolveColumns(columns, header)
+
+    ranges = splitByteRanges(path, headerByteLength(path, 1), jobs)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(parseDataByteRange, path, begin, end, header, delimiter, onlyWlType, includeIndexes) for begin, end in ranges]
+        tables = [f.result() for f in futures]
+
+    tables = [t for t in tables if t is not None]
+    if tables == []:
+        fatal("Datafile parse error, the file does not contain any data rows")
+    return concatenateTables(tables)
+
+
+def readDataTable(datafile, columns, onlyWlType, jobs=1, cache=None):
+    from calplotCore.table import concatenateTables
+
+    if cache is not None and os.path.isfile(datafile.name):
+        from calplotCore.cache import loadCachedTable, storeCachedTable
+        key = cache.fileKey(datafile.name, "table", (columns, onlyWlType))
+        table = loadCachedTable(cache, key)
+        if table is None:
+            table = readDataTable(datafile, columns, onlyWlType, jobs)
+            storeCachedTable(cache, key, table)
+        return table
+
+    if jobs > 1 and os.path.isfile(datafile.name):
+        return readDataTableParallel(datafile.name, columns, onlyWlType, jobs)
+    return concatenateTables(list(iterDataChunks(datafile, columns, onlyWlType)))
+
+
+def readColumnData(datafile, columns, onlyWlType, chunkRows=None):
+    import numpy as np
+
+    header = None
+    columnChunks = None
+    for table in iterDataChunks(datafile, columns, onlyWlType, chunkRows):
+        if header is None:
+            header = table.header
+            columnChunks = [[] for i in range(table.numColumns)]
+
+        for i in range(table.numColumns):
+            columnChunks[i].append(table.validColumn(i))
+
+    return header, [np.concatenate(c) for c in columnChunks]
+
+
+def readColumnSketches(datafile, columns, onlyWlType, chunkRows=None):
+    '''
+    Summarise each column in a QuantileSketch while streaming the file, so
+    that memory use does not grow with the number of rows.
+    '''
+    from calplotCore.stats import QuantileSketch
+
+    header = None
+    sketches = None
+    for table in iterDataChunks(datafile, columns, onlyWlType, chunkRows):
+        if header is None:
+            header = table.header
+            sketches = [QuantileSketch() for i in range(table.numColumns)]
+
+        for i in range(table.numColumns):
+            sketches[i].add(table.validColumn(i))
+
+    return header, sketches
+
+
+def readSampledColumns(datafile, columns, onlyWlType, sampleSize, chunkRows=None, seed=SAMPLE_SEED):
+    '''
+    Stream the file and keep a uniform random sample of at most sampleSize
+    values of each column, ignoring missing values. Every column draws from
+    its own generator, so the sample only depends on the file and the seed.
+    '''
+    import numpy as np
+    from calplotCore.stats import Reservoir
+
+    header = None
+    reservoirs = None
+    for table in iterDataChunks(datafile, columns, onlyWlType, chunkRows):
+        if header is None:
+            header = table.header
+            reservoirs = [Reservoir(sampleSize, np.random.default_rng([seed, i])) for i in range(table.numColumns)]
+
+        for i in range(table.numColumns):
+            reservoirs[i].add(table.validColumn(i))
+
+    return header, [r.sample()[0] if r.filled > 0 else np.empty(0) for r in reservoirs]
+
+
+def readSampledTable(datafile, columns, onlyWlType, sampleSize, chunkRows=None, seed=SAMPLE_SEED):
+    '''
+    Stream the file and keep a uniform random sample of at most sampleSize
+    rows per workload type, so that rare types are not crowded out by
+    common ones. The sampled rows are returned in file order.
+    '''
+    import numpy as np
+    from calplotCore.stats import Reservoir
+    from calplotCore.table import DataTable
+
+    header = None
+    reservoirs = {}
+    rowOffset = 0
+    for table in iterDataChunks(datafile, columns, onlyWlType, chunkRows):
+        header = table.header
+        types = np.array([workloadType(k) for k in table.keys], dtype=object)
+        rowNumbers = np.arange(rowOffset, rowOffset + len(table))
+        for wlType in dict.fromkeys(types):
+            selection = types == wlType
+            if wlType not in reservoirs:
+                reservoirs[wlType] = Reservoir(sampleSize, np.random.default_rng([seed] + list(wlType.encode())))
+            reservoirs[wlType].add(rowNumbers[selection], table.keys[selection], table.values[selection], table.mask[selection])
+        rowOffset += len(table)
+
+    rowNumbers, keys, values, mask = [np.concatenate(c) for c in zip(*[r.sample() for r in reservoirs.values()])]
+    order = np.argsort(rowNumbers)
+    return DataTable(header, keys[order], values[order], mask[order])
+
+
+def readDataFile(datafile, columns, onlyWlType):
+    table = readDataTable(datafile, columns, onlyWlType)
+    return table.header, table.toRows()
+
+
+def fieldSplitter(separator):
+    if separator == WHITESPACE_SEPARATOR:
+        return lambda line: line.split() or [""]
+
+    pattern = re.compile(separator)
+    return lambda line: pattern.split(line.strip())
+
+
+def splitMergeLines(lines, separator, numVals):
+    splitFields = fieldSplitter(separator)
+    rows = []
+    warnings = []
+    for line in lines:
+        values = splitFields(line)
+        if numVals != 0:
+            if len(values) != numVals:
+                warnings.append(f"Cannot parse line: {line.strip()}")
+                continue
+        numVals = len(values)
+
+        rows.append(values)
+
+    return rows, numVals, warnings
+
+
+def parseMergeByteRange(path, begin, end, separator, numVals):
+    rows, numVals, warnings = splitMergeLines(iterMappedLines(path, begin, end), separator, numVals)
+    return rows, warnings
+
+
+def readMergeFile(filename, separator, jobs):
+    lines = iterMappedLines(filename)
+    headLine = next(lines, None)
+    if headLine is None:
+        fatal(f"File {filename} is empty")
+    head = fieldSplitter(separator)(headLine)
+
+    if jobs <= 1:
+        fileRows, numVals, warnings = splitMergeLines(lines, separator, 0)
+        return head, fileRows, numVals, warnings
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    fileRows, numVals, warnings = splitMergeLines(islice(lines, 1), separator, 0)
+    lines.close()
+
+    ranges = splitByteRanges(filename, headerByteLength(filename, 2), jobs)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(parseMergeByteRange, filename, begin, end, separator, numVals) for begin, end in ranges]
+        for f in futures:
+            rows, rangeWarnings = f.result()
+            fileRows += rows
+            warnings += rangeWarnings
+
+    return head, fileRows, numVals, warnings
+
+
+def readFilesForMerge(filenames, separator, columnPrefix, quiet, jobs=1, cache=None):
+
+    fileContents = [None for f in filenames]
+    cacheKeys = [None for f in filenames]
+    if cache is not None:
+        from calplotCore.cache import loadCachedMergeFile, storeCachedMergeFile
+        for fileID in range(len(filenames)):
+            cacheKeys[fileID] = cache.fileKey(filenames[fileID], "merge", separator)
+            fileContents[fileID] = loadCachedMergeFile(cache, cacheKeys[fileID])
+
+    missing = [i for i in range(len(filenames)) if fileContents[i] is None]
+    if jobs > 1 and len(missing) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(jobs, len(missing))) as pool:
+            parsed = list(pool.map(readMergeFile, [filenames[i] for i in missing], [separator] * len(missing), [1] * len(missing)))
+    else:
+        parsed = [readMergeFile(filenames[i], separator, jobs) for i in missing]
+
+    for fileID, contents in zip(missing, parsed):
+        fileContents[fileID] = contents
+        if cache is not None:
+            storeCachedMergeFile(cache, cacheKeys[fileID], *contents)
 
     data = []
 
     for fileID in range(len(filenames)):
         filename = filenames[fileID]
-        curFile = open(filename)
-
-        first = True
-        fileRows = []
-        numVals = 0
-
-        for line in curFile:
-            if first:
-                head = re.split(separator, line.strip())
-                firstLength = len(head)
-                first = False
-            else:
-                values = re.split(separator, line.strip())
-                if numVals != 0:
-                    if len(values) != numVals:
-                        if not quiet:
-                            warn(f"Cannot parse line: {line.strip()}")
-                        continue
-                numVals = len(values)
-
-                fileRows.append(values)
+        head, fileRows, numVals, warnings = fileContents[fileID]
+        firstLength = len(head)
+
+        if not quiet:
+            for w in warnings:
+                warn(w)
 
         if not (firstLength == numVals or firstLength == numVals - 1):
             fatal(f"Unknown header format in file {filename}, possibly a parse error")
@@ -136,30 +600,19 @@ def createDataSeries(rawdata, datacols, plotType, fixWls, onlyWlNum):
             elif l[i] != NO_DATA_STRING:
                 dataseries[i].append(l[i])
 
-    if fixWls:
-        newWls = []
-        for wlbm in dataseries[0]:
-            wlbmlist = wlbm.split("-")
-            wl = f"{wlbmlist[1]}-{wlbmlist[2]}"
+    dataseries[0] = fixWorkloadNames(dataseries[0], fixWls, onlyWlNum)
 
-            if wlbmlist[-2] == "s6":
-                bm = f"{wlbmlist[-2]}-{wlbmlist[-1]}"
-            else:
-                bm = wlbmlist[-1][:-1]
+    return dataseries
 
-            newWls.append(f"{wl}_{bm}")
 
-        dataseries[0] = newWls
+def fixWorkloadNames(keys, fixWls, onlyWlNum):
+    if fixWls:
+        keys = [readableWorkloadName(wl) for wl in keys]
 
     if onlyWlNum:
-        newWls = []
-        for wl in dataseries[0]:
-            tmp = wl.split("-")
-            newWls.append(tmp[-1])
+        keys = [workloadNumber(wl) for wl in keys]
 
-        dataseries[0] = newWls
-
-    return dataseries
+    return keys
 
 
 def colorCodeOffsets(text, doColor):
@@ -1,12 +1,25 @@
+import functools
 import math
+import os
+import re
+import threading
+from contextlib import contextmanager
 
 import numpy as np
 import matplotlib
-import matplotlib.pyplot as plt
 from matplotlib import cm
+from matplotlib.artist import setp
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.font_manager import font_scalings
+from matplotlib.lines import Line2D
 from matplotlib.markers import MarkerStyle
+from matplotlib.ticker import LinearLocator
 
-from calplotCore import numberToString
+from calplotCore import numberToString, TEXT_ENGINES
+from calplotCore.table import DataTable
+from calplotCore.rendercache import renderCached
+from calplotCore.stats import QuantileSketch, boxStatistics, cachedViolinStatistics
 
 ###############################################################################
 # Convenience methods
@@ -23,33 +36,158 @@ def flip(items, ncol):
     return newitems
 
 
-def setUpFonts(kwargs):
+LATEX_TEXT_REPLACEMENTS = [("\\%", "%"), ("\\&", "&"), ("\\#", "#"), ("\\_", "_"), ("\\{", "{"), ("\\}", "}"),
+                           ("~", "\u00a0"), ("---", "\u2014"), ("--", "\u2013"), ("``", "\u201c"), ("''", "\u201d")]
+MATH_SEGMENT_PATTERN = re.compile(r"((?<!\\)\$.*?(?<!\\)\$)")
+
+MAX_LINE_ARTISTS = 64
+
+rcCondition = threading.Condition()
+rcTextEngine = None
+rcRenders = 0
+
+
+@contextmanager
+def textEngineSettings(textEngine="usetex"):
+    '''
+    Hold the rc settings shared by all figures for the duration of a render.
+    rcParams is global, so the text engine can only change while no other
+    thread is rendering: renders with the same engine run concurrently, and
+    a render with another engine waits until they are done. Settings that
+    differ between figures, such as font sizes, are passed to the artists
+    instead.
+
+    The usetex engine runs LaTeX for every piece of text. The mathtext engine
+    uses matplotlib's own math renderer and the PDF core fonts, which avoids
+    the LaTeX runs at the cost of slightly different typesetting.
+    '''
+    global rcTextEngine, rcRenders
+    if textEngine not in TEXT_ENGINES:
+        raise Exception(f"Unknown text engine {textEngine}, must be one of {TEXT_ENGINES}")
+
+    with rcCondition:
+        while rcRenders > 0 and rcTextEngine != textEngine:
+            rcCondition.wait()
+        if rcTextEngine != textEngine:
+            matplotlib.rc('ps', useafm=True)
+            matplotlib.rc('pdf', use14corefonts=True)
+            if textEngine == "usetex":
+                matplotlib.rc('text', usetex=True)
+            else:
+                matplotlib.rc('text', usetex=False)
+                matplotlib.rc('mathtext', fontset='stixsans')
+            rcTextEngine = textEngine
+        rcRenders += 1
 
-    fontsize = 12
-    width = 16
-    height = 3.5
+    try:
+        yield
+    finally:
+        with rcCondition:
+            rcRenders -= 1
+            rcCondition.notify_all()
+
+
+def setUpMatplotlib(textEngine="usetex"):
+    '''
+    Apply the rc settings of this text engine once no render needs another
+    one, for example to set up a worker process before its first render.
+    '''
+    with textEngineSettings(textEngine):
+        pass
+
+
+def holdsTextEngine(plotFunction):
+    @functools.wraps(plotFunction)
+    def render(*args, **kwargs):
+        with textEngineSettings(selectedTextEngine(kwargs)):
+            return plotFunction(*args, **kwargs)
+
+    return render
+
+
+def latexToMathtext(text):
+    segments = MATH_SEGMENT_PATTERN.split(text)
+    for i in range(0, len(segments), 2):
+        for latex, plain in LATEX_TEXT_REPLACEMENTS:
+            segments[i] = segments[i].replace(latex, plain)
+    return "".join(segments)
+
+
+def selectedTextEngine(kwargs):
+    return kwargs.get("textEngine", "usetex")
 
-    if "figheight" in kwargs:
-        height = kwargs["figheight"]
+
+def formatText(text, kwargs):
+    if selectedTextEngine(kwargs) == "mathtext":
+        return latexToMathtext(text)
+    return text
+
+
+class FigurePool:
+    '''
+    Keeps the figures of finished renders so that later renders with the
+    same figure size can reuse them instead of allocating a new figure and
+    canvas. Pass the pool to the plot functions with the figurePool keyword.
+    '''
+
+    def __init__(self, maxFigures=4):
+        self.maxFigures = maxFigures
+        self.lock = threading.Lock()
+        self.free = {}
+
+    def acquire(self, width, height):
+        with self.lock:
+            figures = self.free.get((width, height), [])
+            if figures != []:
+                return figures.pop()
+        return Figure(figsize=(width, height))
+
+    def release(self, fig):
+        fig.clear()
+        width, height = fig.get_size_inches()
+        with self.lock:
+            figures = self.free.setdefault((float(width), float(height)), [])
+            if len(figures) < self.maxFigures:
+                figures.append(fig)
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(f) for f in self.free.values())
+
+
+def fontSize(kwargs):
+    fontsize = 12
 
     if "figwidth" in kwargs:
-        width = kwargs["figwidth"]
         fontsize = 14
 
     if "largeFonts" in kwargs:
         if kwargs["largeFonts"]:
             fontsize += 4
 
-    matplotlib.rc('ps', useafm=True)
-    matplotlib.rc('pdf', use14corefonts=True)
-    matplotlib.rc('text', usetex=True)
-    matplotlib.rc('xtick', labelsize=fontsize)
-    matplotlib.rc('ytick', labelsize=fontsize)
-    matplotlib.rc('legend', fontsize=fontsize)
-    matplotlib.rc('font', size=fontsize)
+    return fontsize
+
+
+def setUpFonts(kwargs):
+
+    width = 16
+    height = 3.5
+
+    if "figheight" in kwargs:
+        height = kwargs["figheight"]
+
+    if "figwidth" in kwargs:
+        width = kwargs["figwidth"]
 
-    fig = plt.figure(figsize=(width, height))
+    if kwargs.get("filename") is None:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=(width, height))
+    elif kwargs.get("figurePool") is not None:
+        fig = kwargs["figurePool"].acquire(float(width), float(height))
+    else:
+        fig = Figure(figsize=(width, height))
     ax = fig.add_subplot(111)
+    ax.tick_params(labelsize=fontSize(kwargs))
 
     return ax
 
@@ -64,15 +202,17 @@ def setXticklabels(ax, names, kwargs):
     rotation = "horizontal"
     if "rotate" in kwargs:
         rotation = kwargs["rotate"]
-    ax.set_xticklabels(names, rotation=rotation)
+    ax.set_xticklabels([formatText(n, kwargs) for n in names], rotation=rotation)
 
 
 def addLabelsAndSeparators(ax, kwargs):
+    fontsize = fontSize(kwargs)
+
     if "xlabel" in kwargs:
-        ax.set_xlabel(kwargs["xlabel"])
+        ax.set_xlabel(formatText(kwargs["xlabel"], kwargs), fontsize=fontsize)
 
     if "ylabel" in kwargs:
-        ax.set_ylabel(kwargs["ylabel"], multialignment='center')
+        ax.set_ylabel(formatText(kwargs["ylabel"], kwargs), multialignment='center', fontsize=fontsize)
 
     ymax = -1
     if "yrange" in kwargs:
@@ -83,12 +223,12 @@ def addLabelsAndSeparators(ax, kwargs):
                 maxy = float(maxy)
             except Exception:
                 raise Exception(f"Could not parse yrange string {kwargs['yrange']}")
-            plt.ylim(miny, maxy)
+            ax.set_ylim(miny, maxy)
             ymax = maxy
 
     if "numYTicks" in kwargs:
         if int(kwargs["numYTicks"]) != -1:
-            ax.yaxis.set_major_locator(plt.LinearLocator(int(kwargs["numYTicks"])))
+            ax.yaxis.set_major_locator(LinearLocator(int(kwargs["numYTicks"])))
 
     if "separators" in kwargs:
         if kwargs["separators"] != "":
@@ -107,7 +247,7 @@ def addLabelsAndSeparators(ax, kwargs):
             labelstr = [i for i in kwargs["labels"].split(":")]
             for t in labelstr:
                 x, y, text, rotation = t.split(",")
-                ax.text(float(x), float(y), text, rotation=rotation)
+                ax.text(float(x), float(y), formatText(text, kwargs), rotation=rotation, fontsize=fontsize)
 
     if "fillBackground" in kwargs:
         if kwargs["fillBackground"] != "":
@@ -118,25 +258,37 @@ def addLabelsAndSeparators(ax, kwargs):
 
     if "figtitle" in kwargs:
         if kwargs["figtitle"] != "none":
-            plt.text(0.5, 0.9, kwargs["figtitle"],
-                     horizontalalignment='center',
-                     fontsize="large",
-                     transform=ax.transAxes)
+            ax.text(0.5, 0.9, formatText(kwargs["figtitle"], kwargs),
+                    horizontalalignment='center',
+                    fontsize=font_scalings["large"] * fontsize,
+                    transform=ax.transAxes)
 
     return ymax
 
 
-def processOutput(kwargs):
+def closeFigure(fig, kwargs):
+    if kwargs.get("figurePool") is not None:
+        kwargs["figurePool"].release(fig)
+    else:
+        fig.clear()
+
+
+def processOutput(ax, kwargs):
     if "filename" in kwargs:
         if kwargs["filename"] is not None:
-            plt.savefig(kwargs["filename"], type="pdf", bbox_inches='tight')
+            try:
+                ax.figure.savefig(kwargs["filename"], bbox_inches='tight')
+            finally:
+                closeFigure(ax.figure, kwargs)
             return
 
     print("\nAttempting to show the plot interactively. If this fails, follow the")
     print("instructions on the below webpage to choose an appropriate backend:")
     print("https://matplotlib.org/3.1.0/tutorials/introductory/usage.html\n")
 
+    import matplotlib.pyplot as plt
     plt.show()
+    plt.close(ax.figure)
 
 
 def addLegend(ax, plottedItems, legendNames, kwargs):
@@ -169,55 +321,135 @@ def addLegend(ax, plottedItems, legendNames, kwargs):
             if lmode == "expand":
                 bboxHeight = 0.3
 
+    legendNames = [formatText(n, kwargs) for n in legendNames]
     ax.legend(plottedItems, legendNames, bbox_to_anchor=(0.0, 1.04, 1.0, bboxHeight), loc="center", mode=lmode, borderaxespad=0.0,
-              frameon=False, ncol=useCols, handletextpad=0.3, labelspacing=0.15, columnspacing=0.5, numpoints=1, scatterpoints=1)
+              frameon=False, ncol=useCols, fontsize=fontSize(kwargs), handletextpad=0.3, labelspacing=0.15, columnspacing=0.5, numpoints=1, scatterpoints=1)
 
 ###############################################################################
 # Plot methods
 ###############################################################################
 
 
-def scatterPlot(xdata, ydata, **kwargs):
+@renderCached
+@holdsTextEngine
+def scatterPlot(xdata, ydata=None, **kwargs):
+    if isinstance(xdata, DataTable):
+        kwargs.setdefault("legend", list(xdata.keys))
+        xdata, ydata = xdata.column(0), xdata.column(1)
+
     if(len(xdata) != len(ydata)):
         raise Exception("X and Y series data must be of equal length")
 
     ax = setUpFonts(kwargs)
 
-    scatters = []
-    assert len(xdata) == len(ydata)
-    for i in range(len(xdata)):
-        thisColor = cm.Blues(1 * (float(i) / len(xdata)))
-        thisMarker = MarkerStyle.filled_markers[i % len(MarkerStyle.filled_markers)]
+    xdata = np.asarray(xdata, dtype=np.float64)
+    ydata = np.asarray(ydata, dtype=np.float64)
+    colors = cm.Blues(np.arange(len(xdata)) / len(xdata))
+    markers = MarkerStyle.filled_markers
 
-        scatters.append(ax.scatter(xdata[i], ydata[i], marker=thisMarker, color=thisColor, edgecolors="black"))
+    # One collection per marker style instead of one per point
+    for i in range(min(len(markers), len(xdata))):
+        ax.scatter(xdata[i::len(markers)], ydata[i::len(markers)], marker=markers[i], color=colors[i::len(markers)], edgecolors="black")
 
-    addLegend(ax, scatters, removeUnderscores(kwargs["legend"]), kwargs)
+    if kwargs.get("pointLegend", True) and "legend" in kwargs:
+        handles = [Line2D([], [], linestyle="", marker=markers[i % len(markers)], color=colors[i], markeredgecolor="black")
+                   for i in range(len(xdata))]
+        addLegend(ax, handles, removeUnderscores(kwargs["legend"]), kwargs)
     addLabelsAndSeparators(ax, kwargs)
-    processOutput(kwargs)
-
-
-def plotLines(xvalues, ydataseries, **kwargs):
+    processOutput(ax, kwargs)
+
+
+def minMaxDownsample(ydataseries, buckets):
+    '''
+    Split the points of each series into this many buckets of consecutive
+    points and return the indexes of the smallest and the largest value in
+    each bucket, in order. With one bucket per pixel column, the line through
+    these points covers the same pixels as the line through all points.
+    '''
+    numSeries, numPoints = ydataseries.shape
+    bucketSize = -(-numPoints // buckets)
+    numBuckets = -(-numPoints // bucketSize)
+
+    padded = np.full((numSeries, numBuckets * bucketSize), np.nan)
+    padded[:, :numPoints] = ydataseries
+    padded = padded.reshape(numSeries, numBuckets, bucketSize)
+    missing = np.isnan(padded)
+    minIndexes = np.where(missing, np.inf, padded).argmin(axis=2)
+    maxIndexes = np.where(missing, -np.inf, padded).argmax(axis=2)
+
+    indexes = np.sort(np.stack([minIndexes, maxIndexes], axis=2), axis=2)
+    indexes += (np.arange(numBuckets) * bucketSize)[:, np.newaxis]
+    return indexes.reshape(numSeries, 2 * numBuckets)
+
+
+def drawLineCollection(ax, xseries, ydataseries, colors, useMarkers, markEvery):
+    '''
+    Draw the lines of all series as one LineCollection. The markers, if any,
+    stay one Line2D per series as the backends stamp those from a single
+    marker path, which is faster than a collection with a color per point.
+    Without markers the plot is a single artist. Returns legend proxies for
+    the series.
+    '''
+    numSeries, numPoints = ydataseries.shape
+    segments = np.empty((numSeries, numPoints, 2))
+    segments[:, :, 0] = xseries
+    segments[:, :, 1] = ydataseries
+    ax.add_collection(LineCollection(segments, colors=colors, zorder=2), autolim=False)
+
+    finite = np.isfinite(segments).all(axis=2)
+    ax.update_datalim(segments[finite])
+    ax.autoscale_view()
+
+    if markEvery > 0:
+        for i in range(numSeries):
+            ax.plot(xseries[i], ydataseries[i], color=colors[i], marker=useMarkers[i % len(useMarkers)], linestyle="none", markevery=markEvery)
+
+    return [Line2D([], [], color=colors[i], marker=useMarkers[i % len(useMarkers)]) for i in range(numSeries)]
+
+
+@renderCached
+@holdsTextEngine
+def plotLines(xvalues, ydataseries=None, **kwargs):
+    if isinstance(xvalues, DataTable):
+        kwargs.setdefault("titles", list(xvalues.header))
+        xvalues, ydataseries = xvalues.keys, xvalues.values.T
 
     ax = setUpFonts(kwargs)
 
-    plt.axhline(0, color='black')
+    ax.axhline(0, color='black')
 
     markEvery = 1
     if "markEvery" in kwargs:
         markEvery = kwargs["markEvery"]
 
+    xvalues = np.array(xvalues, dtype=np.float64)
+    ydataseries = np.array(ydataseries, dtype=np.float64, ndmin=2)
     if "divFactor" in kwargs:
-        for i in range(len(ydataseries)):
-            for j in range(len(ydataseries[i])):
-                if ydataseries[i][j] is not None:
-                    ydataseries[i][j] = ydataseries[i][j] / kwargs["divFactor"]
-
-    lines = []
+        ydataseries = ydataseries / kwargs["divFactor"]
+
+    xseries = np.broadcast_to(xvalues, ydataseries.shape)
+    if kwargs.get("downsample", False):
+        buckets = int(ax.figure.get_figwidth() * ax.figure.dpi)
+        numPoints = ydataseries.shape[1]
+        if numPoints > 2 * buckets:
+            indexes = minMaxDownsample(ydataseries, buckets)
+            xseries = xvalues[indexes]
+            ydataseries = np.take_along_axis(ydataseries, indexes, axis=1)
+            if markEvery > 0:
+                markEvery = max(1, round(markEvery * indexes.shape[1] / numPoints))
+
+    numSeries = len(ydataseries)
+    colors = cm.Paired(np.arange(numSeries) / float(numSeries))
     useMarkers = ['o', 'v', '^', '<', '>', 's', '*', 'D', 'd', 'P', 'X', 'p', '8']
-    for i in range(len(ydataseries)):
-        thisColor = cm.Paired(1 * (float(i) / float(len(ydataseries))))
-        thisMarker = useMarkers[i % len(useMarkers)]
-        lines += ax.plot([float(x) for x in xvalues], ydataseries[i], color=thisColor, marker=thisMarker, markevery=markEvery)
+    if markEvery == 0:
+        useMarkers = ["None"]
+
+    if numSeries <= MAX_LINE_ARTISTS:
+        lines = []
+        for i in range(numSeries):
+            lines += ax.plot(xseries[i], ydataseries[i], color=colors[i], marker=useMarkers[i % len(useMarkers)], markevery=max(markEvery, 1))
+    else:
+        lines = drawLineCollection(ax, xseries, ydataseries, colors, useMarkers, markEvery)
 
     labels = None
     if "titles" in kwargs:
@@ -233,29 +465,32 @@ def plotLines(xvalues, ydataseries, **kwargs):
     rotation = "horizontal"
     if "rotate" in kwargs:
         rotation = kwargs["rotate"]
-    plt.xticks(rotation=rotation)
+    setp(ax.get_xticklabels(), rotation=rotation)
 
     addLabelsAndSeparators(ax, kwargs)
-    processOutput(kwargs)
+    processOutput(ax, kwargs)
 
 
+@renderCached
+@holdsTextEngine
 def boxPlot(data, **kwargs):
+    if isinstance(data, DataTable):
+        kwargs.setdefault("titles", list(data.header))
+        data = data.validColumns()
 
     ax = setUpFonts(kwargs)
 
+    showFliers = True
     if "hideOutliers" in kwargs:
-        if kwargs["hideOutliers"]:
-            outSymbol = ""
-        else:
-            outSymbol = "b+"
-    else:
-        outSymbol = "b+"
+        showFliers = not kwargs["hideOutliers"]
 
-    ax.boxplot(data, sym=outSymbol)
+    # Sketches of streamed columns carry their own approximate statistics
+    stats = [d.boxStatistics() if isinstance(d, QuantileSketch) else boxStatistics(d) for d in data]
+    ax.bxp(stats, showfliers=showFliers, flierprops={"marker": "+", "markerfacecolor": "b", "markeredgecolor": "b", "linestyle": "none"})
 
     xPositions = [i for i in range(len(data) + 1)[1:]]
-    averages = [np.average(d) for d in data]
-    avgLine = plt.plot(xPositions, averages, 'o')
+    averages = [s["mean"] for s in stats]
+    avgLine = ax.plot(xPositions, averages, 'o')
 
     if "titles" in kwargs:
         if len(kwargs["titles"]) != len(data):
@@ -267,10 +502,14 @@ def boxPlot(data, **kwargs):
 
     addLegend(ax, avgLine, ["Arithmetic Mean"], kwargs)
     addLabelsAndSeparators(ax, kwargs)
-    processOutput(kwargs)
+    processOutput(ax, kwargs)
 
 
-def violinPlot(names, values, **kwargs):
+@renderCached
+@holdsTextEngine
+def violinPlot(names, values=None, **kwargs):
+    if isinstance(names, DataTable):
+        names, values = list(names.header), names.validColumns()
 
     ax = setUpFonts(kwargs)
 
@@ -278,14 +517,14 @@ def violinPlot(names, values, **kwargs):
     edgePadding = (1 - violinWidth) / 2
     pos = range(len(names))
 
-    violinData = ax.violinplot(values, pos, points=100, widths=violinWidth, showmeans=False,
-                               showextrema=False, showmedians=True, bw_method=0.1)
+    stats = [cachedViolinStatistics(v, points=100, bandwidth=0.1, cache=kwargs.get("statsCache")) for v in values]
+    violinData = ax.violin(stats, pos, widths=violinWidth, showmeans=False, showextrema=False, showmedians=True)
 
-    plt.setp(violinData['bodies'], facecolor=cm.Blues(0.9), edgecolor='black')
-    plt.setp(violinData['cmedians'], edgecolor='black')
-    # plt.setp(violinData['cmins'], edgecolor='black')
-    # plt.setp(violinData['cmaxes'], edgecolor='black')
-    # plt.setp(violinData['cbars'], edgecolor='black')
+    setp(violinData['bodies'], facecolor=cm.Blues(0.9), edgecolor='black')
+    setp(violinData['cmedians'], edgecolor='black')
+    # setp(violinData['cmins'], edgecolor='black')
+    # setp(violinData['cmaxes'], edgecolor='black')
+    # setp(violinData['cbars'], edgecolor='black')
 
     ax.set_xlim((-violinWidth / 2) - edgePadding, len(names) - (violinWidth / 2) - edgePadding)
     ax.set_xticks(pos)
@@ -293,10 +532,13 @@ def violinPlot(names, values, **kwargs):
 
     setXticklabels(ax, names, kwargs)
     addLabelsAndSeparators(ax, kwargs)
-    processOutput(kwargs)
+    processOutput(ax, kwargs)
 
 
 def cleanNoneValues(values):
+    if isinstance(values, np.ndarray):
+        return np.where(np.isnan(values), 0.0, values)
+
     newvals = []
     for v in values:
         if v is None:
@@ -306,7 +548,11 @@ def cleanNoneValues(values):
     return newvals
 
 
-def barChart(names, values, legendNames, **kwargs):
+@renderCached
+@holdsTextEngine
+def barChart(names, values=None, legendNames=None, **kwargs):
+    if isinstance(names, DataTable):
+        names, values, legendNames = list(names.keys), names.values.T, list(names.header)
 
     ax = setUpFonts(kwargs)
 
@@ -315,6 +561,8 @@ def barChart(names, values, legendNames, **kwargs):
     names = removeUnderscores(names)
     legendNames = removeUnderscores(legendNames)
 
+    values = np.array(values, dtype=np.float64, ndmin=2)
+
     errorcols = False
     if "errorcols" in kwargs:
         errorcols = kwargs["errorcols"]
@@ -325,49 +573,57 @@ def barChart(names, values, legendNames, **kwargs):
     errorrows = False
     if "errorrows" in kwargs:
         errorrows = kwargs["errorrows"]
-        if errorrows:
-            errordata = []
-            newvalues = []
-            for i in range(len(values)):
-                errordata.append([])
-                newvalues.append([])
-                for j in range(len(values[i]))[1::2]:
-                    errordata[i].append(values[i][j])
-                    newvalues[i].append(values[i][j - 1])
-
-            values = newvalues
+
+    errordata = None
+    if errorrows:
+        pairs = values.shape[1] // 2
+        errordata = values[:, 1:2 * pairs:2]
+        values = values[:, 0:2 * pairs:2]
+        names = names[0::2]
 
     if errorcols:
-        numSeries = len(values) / 2
-        localLegend = []
+        heights = values[0::2]
+        errordata = values[1::2]
+        localLegend = legendNames[0::2]
     else:
-        numSeries = len(values)
+        heights = values
         localLegend = legendNames
 
-        if errorrows:
-            newnames = names[0::2]
-            names = newnames
-
+    numSeries = len(heights)
+    numItems = heights.shape[1]
     ind = np.arange(len(names)) + 0.1
+    barwidth = width / float(numSeries)
+
+    # Bar geometry for all series at once, drawn as one collection per series
+    lefts = ind[:numItems] + barwidth * np.arange(numSeries)[:, np.newaxis]
+    if errordata is not None:
+        lefts = lefts - barwidth / 2.0
+    tops = cleanNoneValues(heights)
+
+    verts = np.empty((numSeries, numItems, 4, 2))
+    verts[:, :, 0, 0] = verts[:, :, 1, 0] = lefts
+    verts[:, :, 2, 0] = verts[:, :, 3, 0] = lefts + barwidth
+    verts[:, :, [0, 3], 1] = 0.0
+    verts[:, :, 1, 1] = verts[:, :, 2, 1] = tops
 
     bars = []
     for i in range(numSeries):
-        barwidth = width / float(numSeries)
         thisColor = cm.Blues(1 * (float(i) / numSeries))
-        if errorcols:
-            bars.append(ax.bar(ind + (barwidth * i), cleanNoneValues(values[2 * i]), barwidth, yerr=values[(2 * i) + 1], edgecolor="black", color=thisColor))
-            localLegend.append(legendNames[2 * i])
-        elif errorrows:
-            bars.append(ax.bar(ind + (barwidth * i), cleanNoneValues(values[i]), barwidth, yerr=errordata[i], edgecolor="black", color=thisColor))
-        else:
-            bars.append(ax.bar(ind + (barwidth * i), cleanNoneValues(values[i]), barwidth, edgecolor="black", color=thisColor, align="edge"))
+        collection = PolyCollection(verts[i], facecolors=[thisColor], edgecolors="black", linewidths=matplotlib.rcParams["patch.linewidth"])
+        collection.sticky_edges.y.append(0)
+        ax.add_collection(collection)
+        bars.append(collection)
+
+    if errordata is not None:
+        ax.errorbar((lefts + barwidth / 2.0).ravel(), tops.ravel(), yerr=errordata.ravel(), fmt="none", ecolor="black")
+    ax.autoscale_view()
 
     ax.set_xlim(0, len(names))
     ax.set_xticks(ind + (width / 2.0))
 
     setXticklabels(ax, names, kwargs)
 
-    plt.axhline(0, color='black')
+    ax.axhline(0, color='black')
 
     addLegend(ax, bars, localLegend, kwargs)
     ymax = addLabelsAndSeparators(ax, kwargs)
@@ -387,10 +643,8 @@ def barChart(names, values, legendNames, **kwargs):
                 if ymax != -1:
                     yoffset = 0.02 * ymax
 
-                for i in range(len(values)):
-                    xcoords = ind + (barwidth * i) + (0.5 * barwidth)
-                    for j in range(len(xcoords)):
-                        if i == seriesindex and j == itemindex:
-                            plt.text(xcoords[j], yoffset, numberToString(values[i][j], decimals), rotation="vertical", ha="center", va="bottom")
+                if 0 <= seriesindex < len(values) and 0 <= itemindex < min(len(ind), values.shape[1]):
+                    xcoord = ind[itemindex] + (barwidth * seriesindex) + (0.5 * barwidth)
+                    ax.text(xcoord, yoffset, numberToString(values[seriesindex, itemindex], decimals), rotation="vertical", ha="center", va="bottom", fontsize=fontSize(kwargs))
 
-    processOutput(kwargs)
+    processOutput(ax, kwargs)
@@ -0,0 +1,103 @@
+'''
+Content-addressed cache of rendered plots.
+
+A plot is identified by the plot function, its data, its keyword arguments
+and the versions of matplotlib, NumPy and the plotting code. Lookups do not
+import matplotlib so that calplot.py can skip loading it on a cache hit.
+'''
+import functools
+import hashlib
+import os
+import shutil
+from importlib.metadata import version
+
+import numpy as np
+
+from calplotCore.cache import sourceDigest
+from calplotCore.stats import QuantileSketch
+from calplotCore.table import DataTable
+
+RENDER_CACHE_IGNORED_KWARGS = ["filename", "renderCache", "figurePool", "statsCache"]
+
+
+RENDER_MODULES = ["plot.py", "stats.py", "table.py"]
+
+
+@functools.lru_cache(maxsize=1)
+def renderCodeVersion():
+    return (version("matplotlib"), np.__version__, sourceDigest(*RENDER_MODULES))
+
+
+def hashPlotInput(digest, value):
+    if isinstance(value, DataTable):
+        hashPlotInput(digest, ("DataTable", value.header, value.keys, value.values, value.mask))
+    elif isinstance(value, QuantileSketch):
+        hashPlotInput(digest, ("QuantileSketch", value.means, value.weights, value.count, value.total, value.minimum, value.maximum))
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        digest.update(f"ndarray {value.dtype} {value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, np.ndarray):
+        hashPlotInput(digest, value.tolist())
+    elif isinstance(value, (list, tuple, range)):
+        digest.update(f"{type(value).__name__} {len(value)}(".encode())
+        for v in value:
+            hashPlotInput(digest, v)
+        digest.update(b")")
+    elif isinstance(value, dict):
+        hashPlotInput(digest, sorted(value.items()))
+    else:
+        digest.update(f"{type(value).__name__} {value!r};".encode())
+
+
+def renderKey(plotName, args, kwargs):
+    digest = hashlib.sha256()
+    plotKwargs = {k: v for k, v in kwargs.items() if k not in RENDER_CACHE_IGNORED_KWARGS}
+    hashPlotInput(digest, (plotName, renderCodeVersion(), args, plotKwargs))
+    return digest.hexdigest()
+
+
+def renderCacheEnabled(kwargs):
+    return kwargs.get("renderCache") is not None and isinstance(kwargs.get("filename"), str)
+
+
+def fetchCachedRender(key, kwargs):
+    '''
+    Copy the cached render with this render key to kwargs["filename"].
+    Returns False if the plot is not in the cache.
+    '''
+    filename = kwargs["filename"]
+    path = kwargs["renderCache"].lookup(key, os.path.splitext(filename)[1])
+    if path is None:
+        return False
+    shutil.copyfile(path, filename)
+    return True
+
+
+def storeRender(key, kwargs):
+    filename = kwargs["filename"]
+
+    def copyOutput(f):
+        with open(filename, "rb") as output:
+            shutil.copyfileobj(output, f)
+    kwargs["renderCache"].store(key, os.path.splitext(filename)[1], copyOutput)
+
+
+def renderCached(plotFunction):
+    '''
+    Skip rendering when the plot is already in the render cache (a FileCache
+    passed with the renderCache keyword) and store new renders in it. The key
+    is computed before rendering as the plot functions may modify the labels
+    they are given.
+    '''
+    @functools.wraps(plotFunction)
+    def cachedPlot(*args, **kwargs):
+        if not renderCacheEnabled(kwargs):
+            return plotFunction(*args, **kwargs)
+
+        key = renderKey(plotFunction.__name__, args, kwargs)
+        if fetchCachedRender(key, kwargs):
+            return
+        plotFunction(*args, **kwargs)
+        storeRender(key, kwargs)
+
+    return cachedPlot
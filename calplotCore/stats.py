@@ -0,0 +1,258 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from calplotCore.cache import loadCachedViolinStats, storeCachedViolinStats, sourceDigest
+
+WHISKER_RANGE = 1.5
+DEFAULT_SKETCH_COMPRESSION = 400
+
+KDE_GRID_POINTS = 4096
+KDE_KERNEL_WIDTH = 5.0
+VIOLIN_CACHE_ENTRIES = 64
+
+violinStatsCache = OrderedDict()
+violinStatsLock = threading.Lock()
+
+
+def emptyBoxStatistics():
+    return {"med": np.nan, "q1": np.nan, "q3": np.nan, "iqr": np.nan, "whislo": np.nan, "whishi": np.nan,
+            "mean": np.nan, "fliers": np.empty(0)}
+
+
+def fenceStatistics(q1, med, q3, mean, points, whis):
+    '''
+    Place the whiskers at the most extreme points within whis times the
+    interquartile range of the box, as ax.boxplot does. The points beyond
+    the whiskers are the fliers.
+    '''
+    iqr = q3 - q1
+    inside = points[(points >= q1 - whis * iqr) & (points <= q3 + whis * iqr)]
+
+    whislo = q1
+    whishi = q3
+    if len(inside) > 0:
+        whislo = min(inside.min(), q1)
+        whishi = max(inside.max(), q3)
+
+    fliers = points[(points < whislo) | (points > whishi)]
+    return {"med": med, "q1": q1, "q3": q3, "iqr": iqr, "whislo": whislo, "whishi": whishi, "mean": mean, "fliers": fliers}
+
+
+def boxStatistics(values, whis=WHISKER_RANGE):
+    '''
+    Exact statistics of one box in the format ax.bxp expects. Missing values
+    (NaN) are ignored.
+    '''
+    values = np.asarray(values, dtype=np.float64).ravel()
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return emptyBoxStatistics()
+
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    return fenceStatistics(q1, med, q3, values.mean(), values, whis)
+
+
+class QuantileSketch:
+    '''
+    Mergeable summary of a distribution that is too large to keep in memory.
+    The values are stored as weighted centroids that are small in the tails
+    and large around the median, as in the t-digest, so the sketch holds
+    about compression centroids regardless of the number of values. The
+    count, mean, minimum and maximum are exact, quantiles are approximate.
+    '''
+
+    def __init__(self, compression=DEFAULT_SKETCH_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def __len__(self):
+        return self.count
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        self.count += len(values)
+        self.total += values.sum()
+        self.minimum = min(self.minimum, values.min())
+        self.maximum = max(self.maximum, values.max())
+        self.compress(np.concatenate((self.means, values)), np.concatenate((self.weights, np.ones(len(values)))))
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.compress(np.concatenate((self.means, other.means)), np.concatenate((self.weights, other.weights)))
+
+    def compress(self, means, weights):
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+
+        # Map the quantile where each centroid starts onto the arcsine scale
+        # of the t-digest and merge the centroids that share a unit
+        cumulative = np.cumsum(weights)
+        quantiles = (cumulative - weights) / cumulative[-1]
+        units = np.floor(self.compression / np.pi * (np.arcsin(2 * quantiles - 1) + np.pi / 2))
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(units)) + 1))
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def mean(self):
+        if self.count == 0:
+            return np.nan
+        return self.total / self.count
+
+    def quantiles(self, qs):
+        # Centroids sit at the rank of their middle value, which makes the
+        # quantiles exact while no values have been merged
+        ranks = np.cumsum(self.weights) - (self.weights + 1) / 2
+        return np.interp(np.asarray(qs, dtype=np.float64) * (self.count - 1),
+                         np.concatenate(([0], ranks, [self.count - 1])),
+                         np.concatenate(([self.minimum], self.means, [self.maximum])))
+
+    def boxStatistics(self, whis=WHISKER_RANGE):
+        if self.count == 0:
+            return emptyBoxStatistics()
+
+        q1, med, q3 = self.quantiles([0.25, 0.5, 0.75])
+        points = np.concatenate(([self.minimum], self.means, [self.maximum]))
+        return fenceStatistics(q1, med, q3, self.mean(), points, whis)
+
+
+def binnedGaussianKde(values, grid, sigma):
+    '''
+    Evaluate a Gaussian kernel density estimate at the evenly spaced points
+    of grid, which must cover the values. The values are linearly binned
+    onto the grid and the bins are convolved with the kernel using the FFT,
+    so the cost grows with the number of values plus the grid size instead
+    of their product.
+    '''
+    step = grid[1] - grid[0]
+    position = (values - grid[0]) / step
+    left = np.clip(np.floor(position).astype(np.int64), 0, len(grid) - 2)
+    fraction = position - left
+    bins = np.bincount(left, 1 - fraction, len(grid)) + np.bincount(left + 1, fraction, len(grid))
+
+    reach = min(len(grid) - 1, int(np.ceil(KDE_KERNEL_WIDTH * sigma / step)))
+    offsets = np.arange(-reach, reach + 1) * step
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2) / (sigma * np.sqrt(2 * np.pi))
+
+    size = len(bins) + len(kernel) - 1
+    density = np.fft.irfft(np.fft.rfft(bins, size) * np.fft.rfft(kernel, size), size)
+    return np.maximum(density[reach:reach + len(grid)], 0.0) / len(values)
+
+
+def violinStatistics(values, points=100, bandwidth=0.1):
+    '''
+    Statistics of one violin in the format ax.violin expects. The bandwidth
+    is the kernel standard deviation as a fraction of the standard deviation
+    of the values, like a scalar bw_method for ax.violinplot.
+    '''
+    values = np.asarray(values, dtype=np.float64).ravel()
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return {"coords": np.empty(0), "vals": np.empty(0), "mean": np.nan, "median": np.nan, "min": np.nan, "max": np.nan}
+
+    minimum = values.min()
+    maximum = values.max()
+    coords = np.linspace(minimum, maximum, points)
+    vals = np.zeros(points)
+    if len(values) > 1 and maximum > minimum:
+        grid = np.linspace(minimum, maximum, KDE_GRID_POINTS)
+        vals = np.interp(coords, grid, binnedGaussianKde(values, grid, bandwidth * values.std(ddof=1)))
+
+    return {"coords": coords, "vals": vals, "mean": values.mean(), "median": np.median(values), "min": minimum, "max": maximum}
+
+
+def violinStatisticsKey(values, points, bandwidth):
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    digest = hashlib.sha256(repr(("violin", sourceDigest("stats.py"), KDE_GRID_POINTS, KDE_KERNEL_WIDTH, points, bandwidth, values.shape)).encode())
+    digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def cachedViolinStatistics(values, points=100, bandwidth=0.1, cache=None):
+    '''
+    violinStatistics that reuses the densities computed earlier for the same
+    values, in this process or, if cache is a FileCache, in earlier runs.
+    Restyling a plot then does not recompute the kernel density estimates.
+    '''
+    key = violinStatisticsKey(values, points, bandwidth)
+    with violinStatsLock:
+        if key in violinStatsCache:
+            violinStatsCache.move_to_end(key)
+            return violinStatsCache[key]
+
+    stats = None
+    if cache is not None:
+        stats = loadCachedViolinStats(cache, key)
+    if stats is None:
+        stats = violinStatistics(values, points, bandwidth)
+        if cache is not None:
+            storeCachedViolinStats(cache, key, stats)
+
+    with violinStatsLock:
+        violinStatsCache[key] = stats
+        while len(violinStatsCache) > VIOLIN_CACHE_ENTRIES:
+            violinStatsCache.popitem(last=False)
+    return stats
+
+
+class Reservoir:
+    '''
+    Uniform random sample of at most size rows from a stream of chunks. This
+    is reservoir sampling (Algorithm R) with the random draws and
+    replacements of a whole chunk done at once. Each row is a tuple of
+    arrays, such as keys and values, that are sampled together.
+    '''
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.seen = 0
+        self.filled = 0
+        self.columns = None
+
+    def add(self, *columns):
+        numRows = len(columns[0])
+        if self.columns is None:
+            self.columns = [np.empty((self.size,) + c.shape[1:], dtype=c.dtype) for c in columns]
+
+        fill = min(self.size - self.filled, numRows)
+        for reservoir, c in zip(self.columns, columns):
+            reservoir[self.filled:self.filled + fill] = c[:fill]
+        self.filled += fill
+
+        if fill < numRows:
+            # Row i of the stream replaces a random slot with probability
+            # size / (i + 1). When several rows of the chunk pick the same
+            # slot, the last one wins as it would row by row.
+            slots = self.rng.integers(0, np.arange(self.seen + fill, self.seen + numRows) + 1)
+            replacing = np.flatnonzero(slots < self.size)[::-1]
+            slots, last = np.unique(slots[replacing], return_index=True)
+            rows = fill + replacing[last]
+            for reservoir, c in zip(self.columns, columns):
+                reservoir[slots] = c[rows]
+
+        self.seen += numRows
+
+    def sample(self):
+        if self.columns is None:
+            return []
+        return [c[:self.filled] for c in self.columns]
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class DataTable:
+    '''
+    Columnar representation of a calplot data file. The first column holds
+    the row keys as strings, the remaining columns are float64 values.
+    Missing values (NoData) are stored as NaN and flagged in the mask.
+    '''
+
+    def __init__(self, header, keys, values, mask=None):
+        self.header = list(header)
+        self.keys = np.asarray(keys, dtype=object)
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.keys), len(self.header))
+        if mask is None:
+            mask = np.isnan(self.values)
+        self.mask = np.asarray(mask, dtype=bool).reshape(self.values.shape)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def numColumns(self):
+        return len(self.header)
+
+    def column(self, index):
+        return self.values[:, index]
+
+    def validColumn(self, index):
+        return self.values[~self.mask[:, index], index]
+
+    def validColumns(self):
+        return [self.validColumn(i) for i in range(self.numColumns)]
+
+    def selectColumns(self, indexes):
+        indexes = list(indexes)
+        return DataTable([self.header[i] for i in indexes], self.keys, self.values[:, indexes], self.mask[:, indexes])
+
+    def selectRows(self, selection):
+        return DataTable(self.header, self.keys[selection], self.values[selection], self.mask[selection])
+
+    def withKeys(self, keys):
+        return DataTable(self.header, keys, self.values, self.mask)
+
+    def appendRow(self, key, values):
+        values = np.asarray(values, dtype=np.float64).reshape(1, self.numColumns)
+        return DataTable(self.header,
+                         np.append(self.keys, np.array([key], dtype=object)),
+                         np.vstack((self.values, values)),
+                         np.vstack((self.mask, np.isnan(values))))
+
+    def columnAverages(self):
+        sums = np.where(self.mask, 0.0, self.values).sum(axis=0)
+        counts = (~self.mask).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+
+    def toRows(self):
+        rows = []
+        for i in range(len(self.keys)):
+            row = [self.keys[i]]
+            for j in range(self.numColumns):
+                row.append(None if self.mask[i, j] else float(self.values[i, j]))
+            rows.append(row)
+        return rows
+
+
+def concatenateTables(tables):
+    return DataTable(tables[0].header,
+                     np.concatenate([t.keys for t in tables]),
+                     np.concatenate([t.values for t in tables]),
+                     np.concatenate([t.mask for t in tables]))
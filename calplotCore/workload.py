@@ -0,0 +1,109 @@
+'''
+Parsing of workload keys such as 4-t-h-07 or t-m-12-s6-bench.
+
+All stages that look inside a workload key (merging, type filters, typed
+statistics and workload name shortening) go through the cached functions in
+this module so that every key is only parsed once per process.
+'''
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from calplotCore import TYPED_WORKLOAD_IDENTIFIERS
+
+KEY_CACHE_SIZE = 1 << 16
+
+WorkloadKey = namedtuple("WorkloadKey", ["prefix", "type", "number", "suffix"])
+
+WORKLOAD_TYPES = "".join(TYPED_WORKLOAD_IDENTIFIERS)
+MERGE_KEY_PATTERNS = [re.compile("fair[0-9][0-9]"),
+                      re.compile(f"[0-9]+-t-[{WORKLOAD_TYPES}]-[0-9]+-sp0-.*"),
+                      re.compile(f"[0-9]+-t-[{WORKLOAD_TYPES}]-[0-9]+"),
+                      re.compile(f"t-[{WORKLOAD_TYPES}]-[0-9]*-[0-9].*\\S")]
+
+
+def findTypeSegment(segments):
+    for i in range(1, len(segments) - 1):
+        if segments[i - 1] == "t" and len(segments[i]) == 1:
+            return i
+
+    for i in range(1, len(segments) - 1):
+        if segments[i] in TYPED_WORKLOAD_IDENTIFIERS:
+            return i
+
+    # Keys can also have types outside TYPED_WORKLOAD_IDENTIFIERS, such as b,
+    # c and n
+    for i in range(1, len(segments) - 1):
+        if len(segments[i]) == 1 and segments[i].isalpha():
+            return i
+
+    return -1
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def parseWorkloadKey(key):
+    segments = key.split("-")
+    typeIndex = findTypeSegment(segments)
+    if typeIndex == -1:
+        return WorkloadKey(key, "", "", "")
+
+    prefix = "-".join(segments[:typeIndex])
+    if segments[typeIndex + 1].isdigit():
+        return WorkloadKey(prefix, segments[typeIndex], segments[typeIndex + 1], "-".join(segments[typeIndex + 2:]))
+    return WorkloadKey(prefix, segments[typeIndex], "", "-".join(segments[typeIndex + 1:]))
+
+
+def workloadType(key):
+    return parseWorkloadKey(key).type
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def selectedWorkloadType(key):
+    '''
+    The type --only-type selects on, which is always the second segment of
+    the key. In keys such as 4-t-h-07 this is not the workload type.
+    '''
+    segments = key.split("-", 2)
+    if len(segments) < 2:
+        return ""
+    return segments[1]
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def canonicalWorkloadKey(ident):
+    for pattern in MERGE_KEY_PATTERNS:
+        match = pattern.search(ident)
+        if match is not None:
+            break
+
+    if match is None:
+        return ident
+
+    wl = match.group()
+    wlsections = wl.split("-")
+    if len(wlsections) == 4:
+        wlnum = int(wlsections[3])
+        wlnumstr = str(wlnum)
+        if wlnum < 10:
+            wlnumstr = f"0{wlnum}"
+        wl = f'{"-".join(wlsections[0:3])}-{wlnumstr}'
+    return wl
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def readableWorkloadName(key):
+    wlbmlist = key.split("-")
+    if len(wlbmlist) < 3:
+        return key
+
+    wl = f"{wlbmlist[1]}-{wlbmlist[2]}"
+    if wlbmlist[-2] == "s6":
+        bm = f"{wlbmlist[-2]}-{wlbmlist[-1]}"
+    else:
+        bm = wlbmlist[-1][:-1]
+
+    return f"{wl}_{bm}"
+
+
+def workloadNumber(key):
+    return key.split("-")[-1]
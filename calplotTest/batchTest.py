@@ -0,0 +1,60 @@
+import unittest
+from calplot import generatePlotArgs, parseArgs
+from calbatch import runBatch, runPlotJob
+
+
+class Test(unittest.TestCase):
+
+    def getJob(self, **fields):
+        job = {"type": "bars",
+               "ytitle": "Speed-up",
+               "xtitle": "Workload",
+               "opts": ["--columns 0,1", '--labels "1,2,two words,0"'],
+               "input": "calplotTest/testfiles/data.txt",
+               "output": "testplots/batch.pdf"}
+        job.update(fields)
+        return job
+
+    def testGeneratePlotArgs(self):
+        args = generatePlotArgs(self.getJob())
+        self.assertEqual(args, ["--plot-type", "bars", "-y", "Speed-up", "-x", "Workload",
+                                "--columns", "0,1", "--labels", "1,2,two words,0",
+                                "--outfile", "testplots/batch.pdf", "calplotTest/testfiles/data.txt"])
+
+        opts, args, datafiles = parseArgs(args)
+        for f in datafiles:
+            f.close()
+        self.assertEqual(opts.ytitle, "Speed-up")
+        self.assertEqual(opts.labels, "1,2,two words,0")
+        self.assertEqual(args, ["calplotTest/testfiles/data.txt"])
+
+    def testFailedJobs(self):
+        success, output = runPlotJob(self.getJob(input="calplotTest/testfiles/does-not-exist.txt"))
+        self.assertFalse(success)
+        self.assertIn("Cannot open file", output)
+
+        success, output = runPlotJob({"type": "bars"})
+        self.assertFalse(success)
+        self.assertIn("missing the field(s) ytitle", output)
+
+        jobs = [self.getJob(type="pie"), self.getJob(input="missing.txt"), "not a job"]
+        self.assertEqual(runBatch(jobs, quiet=True), jobs)
+
+    def testChunkedViolinNeedsSample(self):
+        job = self.getJob(type="violin", opts=["--columns 0,1", "--chunk-rows 2"])
+        success, output = runPlotJob(job)
+        self.assertFalse(success)
+        self.assertIn("use --sample with --chunk-rows", output)
+
+        opts, args, datafiles = parseArgs(generatePlotArgs(self.getJob(type="violin", opts=["--chunk-rows 2", "--sample 10"])))
+        for f in datafiles:
+            f.close()
+        self.assertEqual((opts.chunkRows, opts.sample), (2, 10))
+
+    def testFailedJobsInPool(self):
+        jobs = [self.getJob(type="pie"), self.getJob(input="missing.txt"), "not a job", {"type": "bars"}]
+        self.assertEqual(runBatch(jobs, quiet=True, workers=2), jobs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout
+from calplot import main
+from calplotd import PlotDaemon, sendRequest
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socketPath = os.path.join(self.tmpdir, "calplotd.sock")
+        self.daemon = PlotDaemon(self.socketPath, quiet=True)
+        self.thread = threading.Thread(target=self.daemon.serveUntilStopped)
+        self.thread.start()
+
+    def tearDown(self):
+        if self.thread.is_alive():
+            sendRequest(self.socketPath, {"command": "stop"})
+        self.thread.join()
+        self.daemon.server_close()
+        for f in os.listdir(self.tmpdir):
+            os.remove(os.path.join(self.tmpdir, f))
+        os.rmdir(self.tmpdir)
+
+    def request(self, *args):
+        return sendRequest(self.socketPath, {"cwd": os.getcwd(), "args": list(args)})
+
+    def testRender(self):
+        outfile = os.path.join(self.tmpdir, "bars.pdf")
+        reply = self.request("--text-engine", "mathtext", "--outfile", outfile, "calplotTest/testfiles/data.txt")
+        self.assertEqual(reply["status"], 0, reply["output"])
+        self.assertEqual(reply["outfile"], outfile)
+        self.assertTrue(os.path.exists(outfile))
+
+    def testRequestIsNotForwardedAgain(self):
+        outfile = os.path.join(self.tmpdir, "bars.pdf")
+        with mock.patch.dict(os.environ, {"CALPLOT_DAEMON_SOCKET": self.socketPath}):
+            reply = self.request("--text-engine", "mathtext", "--outfile", outfile, "calplotTest/testfiles/data.txt")
+        self.assertEqual(reply["status"], 0, reply["output"])
+        self.assertTrue(os.path.exists(outfile))
+
+        reply = self.request("--daemon-socket", self.socketPath, "--text-engine", "mathtext", "--outfile", outfile,
+                             "calplotTest/testfiles/data.txt")
+        self.assertEqual(reply["status"], 0, reply["output"])
+
+    def testFailedRequests(self):
+        reply = self.request("--outfile", "plot.pdf", "calplotTest/testfiles/does-not-exist.txt")
+        self.assertEqual(reply["status"], -1)
+        self.assertIn("Cannot open file", reply["output"])
+
+        reply = self.request("calplotTest/testfiles/data.txt")
+        self.assertEqual(reply["status"], -1)
+        self.assertIn("only render to files", reply["output"])
+
+        reply = sendRequest(self.socketPath, {"cwd": os.getcwd()})
+        self.assertEqual(reply["status"], -1)
+        self.assertTrue(self.thread.is_alive())
+
+    def testRequestKeepsWorkingDirectory(self):
+        cwd = os.getcwd()
+        reply = sendRequest(self.socketPath, {"cwd": self.tmpdir, "args": ["--text-engine", "mathtext", "--outfile", "bars.pdf",
+                                                                            os.path.join(cwd, "calplotTest/testfiles/data.txt")]})
+        self.assertEqual(reply["status"], 0, reply["output"])
+        self.assertEqual(reply["outfile"], os.path.join(os.path.realpath(self.tmpdir), "bars.pdf"))
+        self.assertEqual(os.getcwd(), cwd)
+
+        reply = sendRequest(self.socketPath, {"cwd": self.tmpdir})
+        self.assertEqual(reply["status"], -1)
+        self.assertEqual(os.getcwd(), cwd)
+
+    def testClient(self):
+        outfile = os.path.join(self.tmpdir, "lines.pdf")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main(["--daemon-socket", self.socketPath, "--text-engine", "mathtext", "--plot-type", "lines",
+                  "--outfile", outfile, "calplotTest/testfiles/data.txt"])
+        self.assertTrue(os.path.exists(outfile))
+        self.assertIn("Done!", output.getvalue())
+
+        missingSocket = os.path.join(self.tmpdir, "missing.sock")
+        with redirect_stdout(output):
+            main(["--daemon-socket", missingSocket, "--text-engine", "mathtext", "--outfile", outfile, "calplotTest/testfiles/data.txt"])
+        self.assertIn("plotting locally", output.getvalue())
+
+    def testStop(self):
+        reply = sendRequest(self.socketPath, {"command": "stop"})
+        self.assertEqual(reply["status"], 0)
+        self.thread.join()
+        self.daemon.server_close()
+        self.assertFalse(os.path.exists(self.socketPath))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,302 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import calplotCore.cache
+from calplotCore.cache import FileCache
+from calplotTest.readBenchmark import writeDataFile, projectionSpeedup
+from calplotCore.io import parseDataRows, parseDataRowsPerCell, readDataTable, iterDataChunks, readColumnData, readColumnSketches, readSampledColumns, readSampledTable, readFilesForMerge
+
+PROJECTION_BENCHMARK_ROWS = 2000
+PROJECTION_BENCHMARK_COLUMNS = 300
+MIN_PROJECTION_SPEEDUP = 4.0
+
+
+class Test(unittest.TestCase):
+
+    def readTable(self, filename, columns="", onlyWlType="", jobs=1):
+        f = open(filename)
+        table = readDataTable(f, columns, onlyWlType, jobs)
+        f.close()
+        return table
+
+    def testReadDataTable(self):
+        table = self.readTable("calplotTest/testfiles/data.txt")
+        self.assertEqual(len(table.header), 10)
+        self.assertEqual(table.values.shape, (len(table), 10))
+        self.assertEqual(table.values.dtype, np.float64)
+        self.assertEqual(table.keys[0], "1")
+        self.assertAlmostEqual(table.values[1, 2], 3.127898)
+        self.assertFalse(table.mask.any())
+
+    def testColumnSelection(self):
+        table = self.readTable("calplotTest/testfiles/data.txt", columns="2,0")
+        self.assertEqual(table.header, ["1\\%", "10\\%"])
+        self.assertAlmostEqual(table.values[1, 1], 3.127898)
+
+    def writeTempFile(self, lines, suffix=".txt"):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        self.addCleanup(os.remove, path)
+        return path
+
+    def testOnlyTypeOutsideTypedIdentifiers(self):
+        path = self.writeTempFile(["a b", "1-b-foo-03 1.0 2.0", "1-c-foo-04 3.0 4.0", "1-b-bar-05 5.0 6.0"])
+        table = self.readTable(path, onlyWlType="b")
+        self.assertEqual(list(table.keys), ["1-b-foo-03", "1-b-bar-05"])
+
+        path = self.writeTempFile(["a b", "1-c-h-03 1.0 2.0", "1-n-a-3 3.0 4.0", "4-t-h-07 5.0 6.0", "t-h-08 7.0 8.0"])
+        for onlyWlType, keys in [("c", ["1-c-h-03"]), ("n", ["1-n-a-3"]), ("t", ["4-t-h-07"]), ("h", ["t-h-08"])]:
+            self.assertEqual(list(self.readTable(path, onlyWlType=onlyWlType).keys), keys)
+            with open(path) as f:
+                self.assertEqual(list(parseDataRowsPerCell(f.readlines()[1:], ["a", "b"], None, onlyWlType, [0, 1]).keys), keys)
+
+    def testRejectsOverWideRows(self):
+        for lines, suffix in [(["a b", "1-t-h-01 1 2", "1-t-h-02 1 2 3"], ".txt"), (["a;b", "1-t-h-01;1;2;3"], ".csv")]:
+            path = self.writeTempFile(lines, suffix)
+            for columns in ["", "0"]:
+                with self.assertRaises(SystemExit):
+                    self.readTable(path, columns)
+
+    def testProjectionSkipsUnselectedFields(self):
+        path = self.writeTempFile(["a b c", "t-h-01 1.0 counter 3.0", "t-h-02 NoData counter 4.0"])
+        table = self.readTable(path, columns="0,2")
+        self.assertEqual(table.header, ["a", "c"])
+        self.assertEqual(table.mask.tolist(), [[False, False], [True, False]])
+        self.assertEqual(table.values[1, 1], 4.0)
+
+    def testSkipsErrorRows(self):
+        path = self.writeTempFile(["a b", "t-h-01 1.0 2.0", "t-h-02 N/A 2.0", "", "t-m-03 RM 1.0", "t-m-04 NoData 5.0"])
+        table = self.readTable(path)
+        self.assertEqual(list(table.keys), ["t-h-01", "t-m-04"])
+        self.assertEqual(table.mask.tolist(), [[False, False], [True, False]])
+
+        table = self.readTable(path, onlyWlType="m")
+        self.assertEqual(list(table.keys), ["t-m-04"])
+
+    def testSkipsShortErrorRows(self):
+        for lines, suffix in [(["a b", "t-h-01 1.0 2.0", "t-h-02 N/A", "t-h-03 RM"], ".txt"), (["a;b", "t-h-01;1.0;2.0", "t-h-02;N/A"], ".csv")]:
+            path = self.writeTempFile(lines, suffix)
+            for columns in ["", "1"]:
+                table = self.readTable(path, columns)
+                self.assertEqual(list(table.keys), ["t-h-01"])
+
+    def testBulkParserMatchesPerCellParser(self):
+        rows = ["t-h-01 1.0 NoData 3.0", "", "t-m-02 N/A 2.0", "k\u00e9y-h-03 4.0 5.0 NoData", "  t-h-04\t7.0  8.0 9.0  ",
+                "t-h-05 RM", "t-m-06 NoData NoData 1e3", "t-h-07 inf -2.5 +.5"]
+        header = ["a", "b", "c"]
+        for delimiter in [None, ";"]:
+            lines = [(r if delimiter is None else ";".join(r.split())) + "\n" for r in rows]
+            for includeIndexes in [[0, 1, 2], [1], [2, 0]]:
+                for onlyWlType in ["", "h"]:
+                    bulk = parseDataRows(lines, header, delimiter, onlyWlType, includeIndexes)
+                    perCell = parseDataRowsPerCell(lines, header, delimiter, onlyWlType, includeIndexes)
+                    self.assertEqual(bulk.header, perCell.header)
+                    self.assertEqual(list(bulk.keys), list(perCell.keys))
+                    np.testing.assert_array_equal(bulk.values, perCell.values)
+                    np.testing.assert_array_equal(bulk.mask, perCell.mask)
+
+    def testNarrowProjectionSpeedup(self):
+        for suffix, delimiter in [(".txt", " "), (".csv", ";")]:
+            path = self.writeTempFile([], suffix)
+            writeDataFile(path, PROJECTION_BENCHMARK_ROWS, PROJECTION_BENCHMARK_COLUMNS, delimiter)
+            speedup = projectionSpeedup(path, "0,1,2")
+            self.assertGreaterEqual(speedup, MIN_PROJECTION_SPEEDUP, f"Reading 3 of {PROJECTION_BENCHMARK_COLUMNS} columns ({suffix}) is only {speedup:.1f}x faster")
+
+    def testDetectsSemicolonDialect(self):
+        path = self.writeTempFile(["a;b", "x y;1.0;2.0", "z;NoData;3.0"], suffix=".dat")
+        table = self.readTable(path)
+        self.assertEqual(table.header, ["a", "b"])
+        self.assertEqual(list(table.keys), ["x y", "z"])
+        self.assertEqual(table.values[0].tolist(), [1.0, 2.0])
+        self.assertTrue(table.mask[1, 0])
+
+    def testParseErrors(self):
+        path = self.writeTempFile(["a b", "x 1.0 2.0", "y 1.0"])
+        self.assertRaises(SystemExit, self.readTable, path)
+
+        path = self.writeTempFile(["a b", "x 1.0 2.0", "y 1.0 abc"])
+        self.assertRaises(SystemExit, self.readTable, path)
+
+    def testParallelRead(self):
+        lines = ["a b c"]
+        for i in range(200):
+            if i % 17 == 0:
+                lines.append(f"t-h-{i} N/A 1.0 2.0")
+            elif i % 13 == 0:
+                lines.append(f"t-m-{i} NoData {i}.5 2.0")
+            else:
+                lines.append(f"t-h-{i} {i}.0 1.0 2.0")
+        path = self.writeTempFile(lines)
+
+        for columns in ["", "0,2"]:
+            serial = self.readTable(path, columns)
+            for jobs in [2, 3, 7]:
+                parallel = self.readTable(path, columns, jobs=jobs)
+                self.assertEqual(list(parallel.keys), list(serial.keys))
+                np.testing.assert_array_equal(parallel.values, serial.values)
+                np.testing.assert_array_equal(parallel.mask, serial.mask)
+
+    def testParallelMergeRead(self):
+        lines = ["a b"]
+        for i in range(100):
+            lines.append(f"k{i} {i} 1" if i % 11 != 5 else f"k{i} {i}")
+        path = self.writeTempFile(lines)
+
+        serial = readFilesForMerge([path], "\\s+", "", True)
+        parallel = readFilesForMerge([path], "\\s+", "", True, jobs=4)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(len(serial[0][1]), 100 - 9)
+
+    def testMergeReadSeparators(self):
+        path = self.writeTempFile(["a,b", "k1,1,2", "", "k2,3,4"])
+        head, rows, numVals, filename = readFilesForMerge([path], ",", "", True)[0]
+        self.assertEqual(head, ["a", "b"])
+        self.assertEqual(rows, [["k1", "1", "2"], ["k2", "3", "4"]])
+        self.assertEqual(numVals, 3)
+
+        path = self.writeTempFile(["  a\tb ", "k1  1\t2", "k2 3 4"])
+        head, rows, numVals, filename = readFilesForMerge([path], "\\s+", "", True)[0]
+        self.assertEqual(head, ["a", "b"])
+        self.assertEqual(rows, [["k1", "1", "2"], ["k2", "3", "4"]])
+
+    def testParseCache(self):
+        cachedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cachedir)
+        cache = FileCache(cachedir)
+
+        path = self.writeTempFile(["a b", "t-h-01 1.0 2.0", "t-h-02 NoData 3.0"])
+        for i in range(2):
+            with open(path) as f:
+                table = readDataTable(f, "1", "", cache=cache)
+            self.assertEqual(table.header, ["b"])
+            self.assertEqual(list(table.keys), ["t-h-01", "t-h-02"])
+            self.assertEqual(table.values[:, 0].tolist(), [2.0, 3.0])
+        self.assertEqual(len(os.listdir(cachedir)), 1)
+
+        with open(path, "a") as f:
+            f.write("t-h-03 NoData 4.0\n")
+        with open(path) as f:
+            table = readDataTable(f, "", "", cache=cache)
+        self.assertEqual(table.mask.tolist(), [[False, False], [True, False], [True, False]])
+
+        serial = readFilesForMerge([path], "\\s+", "", True)
+        for i in range(2):
+            self.assertEqual(readFilesForMerge([path], "\\s+", "", True, cache=cache), serial)
+
+        FileCache(cachedir, maxBytes=0).evict()
+        self.assertEqual(os.listdir(cachedir), [])
+
+    def testParseCacheKeyIncludesParserVersion(self):
+        cachedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cachedir)
+        cache = FileCache(cachedir)
+        path = self.writeTempFile(["a b", "t-h-01 1.0 2.0"])
+
+        key = cache.fileKey(path, "table", ("", ""))
+        parserModules = calplotCore.cache.PARSER_MODULES
+        calplotCore.cache.PARSER_MODULES = parserModules[:-1]
+        try:
+            self.assertNotEqual(cache.fileKey(path, "table", ("", "")), key)
+        finally:
+            calplotCore.cache.PARSER_MODULES = parserModules
+
+    def testMergeCacheCells(self):
+        cachedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cachedir)
+        cache = FileCache(cachedir)
+
+        path = self.writeTempFile(["a;b", "k\u00e9y;1;", "a-much-longer-key;22;333"], ".csv")
+        serial = readFilesForMerge([path], ";", "", True)
+        self.assertEqual(serial[0][1][0], ["k\u00e9y", "1", ""])
+        for i in range(2):
+            self.assertEqual(readFilesForMerge([path], ";", "", True, cache=cache), serial)
+
+    def testToRows(self):
+        table = self.readTable("calplotTest/testfiles/missing-data.txt")
+        rows = table.toRows()
+        self.assertEqual(rows[0][0], "0.01")
+        self.assertEqual(len(rows[0]), len(table.header) + 1)
+        self.assertAlmostEqual(rows[0][1], 0.003642)
+
+    def testChunkedRead(self):
+        full = self.readTable("calplotTest/testfiles/data.txt")
+        f = open("calplotTest/testfiles/data.txt")
+        chunks = list(iterDataChunks(f, "1,3", "", chunkRows=3))
+        f.close()
+        self.assertTrue(all(len(c) <= 3 for c in chunks))
+        self.assertEqual(sum(len(c) for c in chunks), len(full))
+        self.assertEqual(chunks[0].header, [full.header[1], full.header[3]])
+        np.testing.assert_array_equal(np.concatenate([c.values for c in chunks]), full.values[:, [1, 3]])
+
+    def testReadColumnData(self):
+        full = self.readTable("calplotTest/testfiles/data.txt")
+        f = open("calplotTest/testfiles/data.txt")
+        header, columns = readColumnData(f, "", "", chunkRows=2)
+        f.close()
+        self.assertEqual(header, full.header)
+        for i in range(len(columns)):
+            np.testing.assert_array_equal(columns[i], full.column(i))
+
+    def testReadColumnSketches(self):
+        full = self.readTable("calplotTest/testfiles/data.txt")
+        f = open("calplotTest/testfiles/data.txt")
+        header, sketches = readColumnSketches(f, "", "", chunkRows=2)
+        f.close()
+        self.assertEqual(header, full.header)
+        for i in range(len(sketches)):
+            self.assertEqual(len(sketches[i]), len(full))
+            self.assertAlmostEqual(sketches[i].mean(), full.columnAverages()[i])
+            stats = sketches[i].boxStatistics()
+            self.assertAlmostEqual(stats["q1"], np.percentile(full.column(i), 25))
+            self.assertAlmostEqual(stats["med"], np.median(full.column(i)))
+
+    def sampledFile(self):
+        lines = ["a b"]
+        for i in range(500):
+            wlType = "m" if i % 50 == 0 else "h"
+            b = "NoData" if i % 3 == 0 else f"{i}.5"
+            lines.append(f"t-{wlType}-{i} {i}.0 {b}")
+        return self.writeTempFile(lines)
+
+    def testReadSampledColumns(self):
+        path = self.sampledFile()
+        samples = []
+        for chunkRows in [7, 100, None]:
+            with open(path) as f:
+                header, columns = readSampledColumns(f, "", "", 40, chunkRows)
+            self.assertEqual(header, ["a", "b"])
+            self.assertEqual([len(c) for c in columns], [40, 40])
+            self.assertEqual(len(set(columns[0])), 40)
+            self.assertTrue(np.all(columns[1] % 1 == 0.5))
+            samples.append(columns)
+
+        for columns in samples[1:]:
+            np.testing.assert_array_equal(columns[0], samples[0][0])
+            np.testing.assert_array_equal(columns[1], samples[0][1])
+
+        with open(path) as f:
+            header, columns = readSampledColumns(f, "", "", 1000)
+        self.assertEqual(sorted(columns[0]), [float(i) for i in range(500)])
+
+    def testReadSampledTable(self):
+        path = self.sampledFile()
+        with open(path) as f:
+            table = readSampledTable(f, "", "", 20, chunkRows=33)
+        self.assertEqual(len(table), 30)
+        self.assertEqual(sum(k.startswith("t-m-") for k in table.keys), 10)
+
+        rows = table.values[:, 0]
+        self.assertTrue(np.all(np.diff(rows) > 0))
+        self.assertEqual(list(table.keys), [f"t-{'m' if r % 50 == 0 else 'h'}-{int(r)}" for r in rows])
+        np.testing.assert_array_equal(table.mask[:, 1], rows % 3 == 0)
+
+        with open(path) as f:
+            again = readSampledTable(f, "", "", 20)
+        np.testing.assert_array_equal(again.values, table.values)
+
+
+if __name__ == "__main__":
+    unittest.main()
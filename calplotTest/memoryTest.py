@@ -0,0 +1,58 @@
+import gc
+import io
+import resource
+import sys
+import unittest
+from matplotlib.figure import Figure
+from calplotCore.io import readDataTable
+from calplotCore.plot import FigurePool, barChart
+
+RENDERS = 1000
+WARMUP_RENDERS = 20
+MAX_RSS_GROWTH_MB = 50
+
+
+def peakRssMB():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1 << 20)
+    return peak / (1 << 10)
+
+
+def liveFigures():
+    gc.collect()
+    return sum(1 for o in gc.get_objects() if isinstance(o, Figure))
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        with open("calplotTest/testfiles/data.txt") as f:
+            self.table = readDataTable(f, "0,1,2", "")
+
+    def render(self, count, **kwargs):
+        for i in range(count):
+            barChart(self.table, filename=io.BytesIO(), figwidth=4.0, figheight=2.0, **kwargs)
+
+    def checkMemory(self, **kwargs):
+        self.render(WARMUP_RENDERS, **kwargs)
+        figures = liveFigures()
+        rss = peakRssMB()
+
+        self.render(RENDERS, **kwargs)
+
+        self.assertLessEqual(liveFigures(), figures, f"Figures are kept alive after {RENDERS} renders")
+        growth = peakRssMB() - rss
+        self.assertLess(growth, MAX_RSS_GROWTH_MB, f"Peak RSS grew by {growth:.1f} MB over {RENDERS} renders")
+
+    def testRenderMemory(self):
+        self.checkMemory()
+
+    def testFigurePoolMemory(self):
+        pool = FigurePool(maxFigures=2)
+        self.checkMemory(figurePool=pool)
+        self.assertEqual(len(pool), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -31,6 +31,24 @@ class Test(unittest.TestCase):
 
         self.compare(processedData, processedCorrectData)
 
+    def testParallelFileRead(self):
+        filenames = ["calplotTest/testfiles/merge-test-input.txt", "calplotTest/testfiles/merge-test-output.txt", "calplotTest/testfiles/merge-test-input.txt"]
+        serialData = readFilesForMerge(filenames, "\\s+", "a,b,c", False)
+        parallelData = readFilesForMerge(filenames, "\\s+", "a,b,c", False, jobs=3)
+        self.assertEqual(serialData, parallelData)
+        self.assertEqual(mergeData(serialData, False, False), mergeData(parallelData, False, False))
+
+    def testJoinTypes(self):
+        fileData = [(["a"], [["4-t-h-1", "1"], ["4-t-m-2", "2"]], 2, "f1"),
+                    (["b"], [["4-t-h-01", "3"]], 2, "f2")]
+
+        innerData, columnToFileList = mergeData(fileData, False, False, "inner", True)
+        self.compare(innerData, [["", "a", "b"], ["4-t-h-01", "1", "3"]])
+
+        outerData, columnToFileList = mergeData(fileData, False, False, "outer", True)
+        self.compare(outerData, [["", "a", "b"], ["4-t-h-01", "1", "3"], ["4-t-m-02", "2", "NoData"]])
+        self.assertEqual(columnToFileList, ["f1", "f2"])
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
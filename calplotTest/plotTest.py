@@ -5,8 +5,23 @@ Created on May 16, 2018
 '''
 import unittest
 import os
-from calplotCore.io import readDataFile, createDataSeries
-from calplotCore.plot import scatterPlot, plotLines, boxPlot, violinPlot, barChart
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from calplotCore import setTexCache
+from calplotCore.io import readDataFile, readDataTable, createDataSeries
+from calplotCore.plot import scatterPlot, plotLines, boxPlot, violinPlot, barChart, latexToMathtext, minMaxDownsample, drawLineCollection, textEngineSettings, setUpMatplotlib
+from calbatch import runBatch
+from calplotCore.cache import FileCache
+import calplotCore.rendercache
+from calplotCore.rendercache import renderKey, renderCodeVersion
+from calplotCore.stats import QuantileSketch
 
 
 class Test(unittest.TestCase):
@@ -16,6 +31,12 @@ class Test(unittest.TestCase):
         f.close()
         return header, createDataSeries(data, len(header), "", False, False)
 
+    def getTable(self, filename):
+        f = open(filename)
+        table = readDataTable(f, "", "")
+        f.close()
+        return table
+
     def getOutpath(self, name):
         return f"{self.outdir}/{name}"
 
@@ -32,15 +53,54 @@ class Test(unittest.TestCase):
     def testScatterPlot(self):
         scatterPlot(self.dataseries[1], self.dataseries[2], legend=self.dataseries[0], filename=self.getOutpath("scatter.pdf"))
 
+    def testLargeScatterPlot(self):
+        xdata = [float(i % 97) for i in range(5000)]
+        ydata = [float(i % 89) for i in range(5000)]
+        scatterPlot(xdata, ydata, pointLegend=False, filename=self.getOutpath("scatter-large.pdf"))
+
     def testLinePlot(self):
         plotLines(self.dataseries[0], self.dataseries[1:], titles=self.header, filename=self.getOutpath("lines.pdf"))
 
     def testLinePlotWithMissingData(self):
         plotLines(self.missingDataSeries[0], self.missingDataSeries[1:], titles=self.missingDataHeader, filename=self.getOutpath("lines-missing.pdf"))
 
+    def testManyLines(self):
+        xvalues = [str(i) for i in range(50)]
+        ydataseries = [[float((i * j) % 23) if i != j else None for i in range(50)] for j in range(200)]
+        plotLines(xvalues, ydataseries, titles=[f"s{j}" for j in range(200)], legendColumns=10, markEvery=5, divFactor=2.0, filename=self.getOutpath("lines-many.pdf"))
+
+    def testLineCollectionWithoutMarkers(self):
+        ax = Figure().add_subplot()
+        ydataseries = np.arange(600.0).reshape(200, 3)
+        xseries = np.broadcast_to(np.arange(3.0), ydataseries.shape)
+        colors = np.ones((200, 4))
+        handles = drawLineCollection(ax, xseries, ydataseries, colors, ["None"], 0)
+        self.assertEqual(len(handles), 200)
+        self.assertEqual(len(ax.collections), 1)
+        self.assertEqual(len(ax.lines), 0)
+        plotLines(list(range(3)), ydataseries, markEvery=0, filename=self.getOutpath("lines-nomarkers.pdf"))
+
+    def testMinMaxDownsample(self):
+        ydataseries = np.array([[0.0, 5.0, 1.0, -2.0, np.nan, np.nan, 3.0], [1.0, 1.0, 1.0, 9.0, 8.0, 7.0, np.nan]])
+        indexes = minMaxDownsample(ydataseries, 3)
+        self.assertEqual(indexes.tolist(), [[0, 1, 3, 3, 6, 6], [0, 0, 3, 5, 6, 6]])
+
+    def testDownsampledLinePlot(self):
+        xvalues = np.arange(200000)
+        ydataseries = np.sin(xvalues / 1000.0) * np.arange(1, 4)[:, np.newaxis]
+        ydataseries[1, 5000:9000] = np.nan
+        plotLines(xvalues, ydataseries, markEvery=10000, downsample=True, filename=self.getOutpath("lines-downsampled.pdf"))
+
     def testBoxPlot(self):
         boxPlot(self.dataseries[1:], titles=self.header, filename=self.getOutpath("box.pdf"))
 
+    def testSketchBoxPlot(self):
+        sketches = [QuantileSketch() for i in range(len(self.header))]
+        for i in range(len(sketches)):
+            for chunk in range(0, len(self.dataseries[i + 1]), 3):
+                sketches[i].add(self.dataseries[i + 1][chunk:chunk + 3])
+        boxPlot(sketches, titles=self.header, hideOutliers=True, filename=self.getOutpath("box-sketch.pdf"))
+
     def testViolinPlot(self):
         violinPlot(self.header, self.dataseries[1:], filename=self.getOutpath("violin.pdf"))
 
@@ -50,6 +110,187 @@ class Test(unittest.TestCase):
     def testBarChartWithMissingData(self):
         barChart(self.missingDataSeries[0], self.missingDataSeries[1:], self.missingDataHeader, filename=self.getOutpath("bars-missing.pdf"))
 
+    def testBarChartErrors(self):
+        table = self.getTable("calplotTest/testfiles/data.txt")
+        barChart(table, errorcols=True, filename=self.getOutpath("bars-errorcols.pdf"))
+        barChart(table, errorrows=True, datalabels="1,1,2", filename=self.getOutpath("bars-errorrows.pdf"))
+
+    def testLargeBarChart(self):
+        names = [f"wl{i}" for i in range(2000)]
+        values = [[float((i * j) % 17) for i in range(2000)] for j in range(1, 6)]
+        barChart(names, values, [f"s{j}" for j in range(5)], datalabels="2,1000,1", filename=self.getOutpath("bars-large.pdf"))
+
+    def testPlotsFromTable(self):
+        table = self.getTable("calplotTest/testfiles/data.txt")
+        barChart(table, filename=self.getOutpath("bars-table.pdf"))
+        plotLines(table, filename=self.getOutpath("lines-table.pdf"))
+        boxPlot(table, filename=self.getOutpath("box-table.pdf"))
+        violinPlot(table, filename=self.getOutpath("violin-table.pdf"))
+        scatterPlot(table, filename=self.getOutpath("scatter-table.pdf"))
+
+    def testMathtextEngine(self):
+        table = self.getTable("calplotTest/testfiles/data.txt")
+        kwargs = {"textEngine": "mathtext", "xlabel": "Share of LLC (\\%)", "ylabel": "IPC $\\times 10^3$", "figtitle": "A \\& B"}
+        barChart(table, filename=self.getOutpath("bars-mathtext.pdf"), **kwargs)
+        plotLines(table, filename=self.getOutpath("lines-mathtext.pdf"), **kwargs)
+        boxPlot(table, filename=self.getOutpath("box-mathtext.pdf"), **kwargs)
+        violinPlot(table, filename=self.getOutpath("violin-mathtext.pdf"), **kwargs)
+        scatterPlot(table, filename=self.getOutpath("scatter-mathtext.pdf"), **kwargs)
+
+    def testLatexToMathtext(self):
+        self.assertEqual(latexToMathtext("10\\% \\& 20\\%"), "10% & 20%")
+        self.assertEqual(latexToMathtext("$x\\_1$ and a\\_b"), "$x\\_1$ and a_b")
+        self.assertEqual(latexToMathtext("1--4 \\$5"), "1\u20134 \\$5")
+
+    def testTexCacheAfterMatplotlibIsLoaded(self):
+        configDir = os.environ.get("MPLCONFIGDIR")
+        setTexCache(matplotlib.get_cachedir())
+        with self.assertRaises(Exception):
+            setTexCache(self.getOutpath("texcache-unused"))
+        self.assertEqual(os.environ.get("MPLCONFIGDIR"), configDir)
+        self.assertFalse(os.path.exists(self.getOutpath("texcache-unused")))
+
+    def testTexCacheIsMatplotlibCacheDirectory(self):
+        texcache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, texcache)
+        subprocess.run([sys.executable, "calplot.py", "--tex-cache", texcache, "--text-engine", "mathtext",
+                        "--outfile", self.getOutpath("bars-texcache-mathtext.pdf"), "calplotTest/testfiles/data.txt"],
+                       check=True, stdout=subprocess.DEVNULL)
+        self.assertTrue(any(f.startswith("fontlist") for f in os.listdir(texcache)))
+
+    @unittest.skipUnless(shutil.which("latex"), "LaTeX is not installed")
+    def testTexCache(self):
+        texcache = tempfile.mkdtemp()
+        subprocess.run([sys.executable, "calplot.py", "--tex-cache", texcache, "--outfile", self.getOutpath("bars-texcache.pdf"),
+                        "calplotTest/testfiles/data.txt"], check=True, stdout=subprocess.DEVNULL)
+        self.assertNotEqual(os.listdir(texcache), [])
+        shutil.rmtree(texcache)
+
+    def testRenderCache(self):
+        cachedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cachedir)
+        cache = FileCache(cachedir)
+        table = self.getTable("calplotTest/testfiles/data.txt")
+
+        first = self.getOutpath("bars-render-cache-1.pdf")
+        barChart(table, filename=first, renderCache=cache, textEngine="mathtext")
+        entries = os.listdir(cachedir)
+        self.assertEqual(len(entries), 1)
+        with open(os.path.join(cachedir, entries[0]), "wb") as f:
+            f.write(b"cached")
+
+        second = self.getOutpath("bars-render-cache-2.pdf")
+        barChart(table, filename=second, renderCache=cache, textEngine="mathtext")
+        with open(second, "rb") as f:
+            self.assertEqual(f.read(), b"cached")
+
+        for kwargs in [{"largeFonts": True}, {"ylabel": "Other"}]:
+            barChart(table, filename=second, renderCache=cache, textEngine="mathtext", **kwargs)
+            with open(second, "rb") as f:
+                self.assertNotEqual(f.read(), b"cached")
+        barChart(table.appendRow("AVG", table.columnAverages()), filename=second, renderCache=cache, textEngine="mathtext")
+        self.assertEqual(len(os.listdir(cachedir)), 4)
+
+        cache.maxBytes = 0
+        cache.evict()
+        self.assertEqual(os.listdir(cachedir), [])
+
+    def testRenderCacheWithUnderscoreLabels(self):
+        cachedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cachedir)
+        cache = FileCache(cachedir)
+
+        def render():
+            barChart(["a_b", "c_d"], [[1.0, 2.0]], ["s_1"], filename=self.getOutpath("bars-underscores.pdf"), renderCache=cache, textEngine="mathtext")
+            plotLines(["1", "2"], [[1.0, 2.0]], titles=["s_1"], filename=self.getOutpath("lines-underscores.pdf"), renderCache=cache, textEngine="mathtext")
+
+        render()
+        entries = os.listdir(cachedir)
+        self.assertEqual(len(entries), 2)
+        for entry in entries:
+            with open(os.path.join(cachedir, entry), "wb") as f:
+                f.write(b"cached")
+
+        render()
+        self.assertEqual(sorted(os.listdir(cachedir)), sorted(entries))
+        for name in ["bars-underscores.pdf", "lines-underscores.pdf"]:
+            with open(self.getOutpath(name), "rb") as f:
+                self.assertEqual(f.read(), b"cached")
+
+    def testRenderKeyIncludesStatsCode(self):
+        table = self.getTable("calplotTest/testfiles/data.txt")
+        key = renderKey("violinPlot", (table,), {})
+        renderModules = calplotCore.rendercache.RENDER_MODULES
+        calplotCore.rendercache.RENDER_MODULES = ["plot.py"]
+        renderCodeVersion.cache_clear()
+        try:
+            self.assertNotEqual(renderKey("violinPlot", (table,), {}), key)
+        finally:
+            calplotCore.rendercache.RENDER_MODULES = renderModules
+            renderCodeVersion.cache_clear()
+
+    def testThreadedRender(self):
+        table = self.getTable("calplotTest/testfiles/data.txt")
+        renders = []
+        for i in range(4):
+            renders.append((barChart, {"filename": self.getOutpath(f"threaded-bars-{i}.pdf"), "largeFonts": i % 2 == 0}))
+            renders.append((plotLines, {"filename": self.getOutpath(f"threaded-lines-{i}.pdf"), "figwidth": 8.0}))
+            renders.append((boxPlot, {"filename": self.getOutpath(f"threaded-box-{i}.pdf"), "yrange": "0,10"}))
+            renders.append((violinPlot, {"filename": self.getOutpath(f"threaded-violin-{i}.pdf")}))
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(plot, table, **kwargs) for plot, kwargs in renders]
+            for f in futures:
+                f.result()
+
+        for plot, kwargs in renders:
+            self.assertTrue(os.path.exists(kwargs["filename"]))
+
+    def testTextEngineChangeWaitsForRenders(self):
+        switched = threading.Event()
+
+        def switchEngine():
+            setUpMatplotlib("usetex")
+            switched.set()
+
+        with textEngineSettings("mathtext"):
+            thread = threading.Thread(target=switchEngine)
+            thread.start()
+            self.assertFalse(switched.wait(0.2))
+            with textEngineSettings("mathtext"):
+                pass
+        thread.join()
+        self.assertTrue(switched.is_set())
+
+    @unittest.skipUnless(shutil.which("latex"), "LaTeX is not installed")
+    def testThreadedRenderWithMixedEngines(self):
+        table = self.getTable("calplotTest/testfiles/data.txt")
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(barChart, table, filename=self.getOutpath(f"engines-bars-{i}.pdf"), textEngine=["usetex", "mathtext"][i % 2])
+                       for i in range(8)]
+            for f in futures:
+                f.result()
+
+    def testBatchRender(self):
+        jobs = []
+        for plotType in ["bars", "lines", "boxes", "violin", "scatter"]:
+            jobs.append({"type": plotType, "ytitle": "Y", "xtitle": "X", "opts": ["--columns 0,1", "--text-engine mathtext"],
+                         "input": "calplotTest/testfiles/data.txt", "output": self.getOutpath(f"batch-{plotType}.pdf")})
+        self.assertEqual(runBatch(jobs, quiet=True), [])
+        for job in jobs:
+            self.assertTrue(os.path.exists(job["output"]))
+
+    def testParallelBatchRender(self):
+        jobs = []
+        for plotType in ["bars", "lines", "boxes", "violin", "scatter"]:
+            jobs.append({"type": plotType, "ytitle": "Y", "xtitle": "X", "opts": ["--text-engine mathtext"],
+                         "input": "calplotTest/testfiles/data.txt", "output": self.getOutpath(f"parallel-{plotType}.pdf")})
+        jobs.append({"type": "bars", "ytitle": "Y", "xtitle": "X", "opts": ["--text-engine mathtext"],
+                     "input": "calplotTest/testfiles/does-not-exist.txt", "output": self.getOutpath("parallel-missing.pdf")})
+        self.assertEqual(runBatch(jobs, quiet=True, workers=3), jobs[-1:])
+        for job in jobs[:-1]:
+            self.assertTrue(os.path.exists(job["output"]))
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
@@ -0,0 +1,124 @@
+'''
+Compares the bulk data file reader with the original per-cell reader.
+
+Run from the repository root: python calplotTest/readBenchmark.py
+'''
+import csv
+import os
+import random
+import tempfile
+import time
+from optparse import OptionParser
+
+from calplotCore import NO_DATA_STRING
+from calplotCore.io import readDataTable
+
+
+def legacyReadDataFile(datafile, columns):
+    useCsv = datafile.name.endswith(".csv")
+    if useCsv:
+        datafile = csv.reader(datafile, delimiter=";")
+        header = next(datafile)
+    else:
+        header = datafile.readline().strip().split()
+
+    data = []
+    for l in datafile:
+        rawline = l if useCsv else l.strip().split()
+        if rawline == []:
+            continue
+        tmp = [rawline[0]]
+
+        error = False
+        for e in rawline[1:]:
+            if e == "N/A" or e == "RM":
+                error = True
+                continue
+            elif e == NO_DATA_STRING:
+                tmp.append(None)
+                continue
+            tmp.append(float(e))
+
+        if not error:
+            data.append(tmp)
+
+    if columns != "":
+        includelist = [float(s) for s in columns.split(",")]
+        newdata = []
+        for l in data:
+            newline = [l[0]]
+            for i in range(len(header)):
+                if i in includelist:
+                    newline.append(l[i + 1])
+            newdata.append(newline)
+        data = newdata
+
+    return header, data
+
+
+def writeDataFile(path, rows, cols, delimiter):
+    random.seed(0)
+    with open(path, "w") as f:
+        f.write(delimiter.join(f"c{i}" for i in range(cols)) + "\n")
+        for r in range(rows):
+            values = [f"{random.random() * 1000:.6f}" for i in range(cols)]
+            if r % 97 == 0:
+                values[r % cols] = NO_DATA_STRING
+            if r % 1013 == 0:
+                values[0] = "N/A"
+            f.write(delimiter.join([f"t-h-{r}"] + values) + "\n")
+
+
+def bestTime(reader, path, columns, repeats=3):
+    best = float("inf")
+    for i in range(repeats):
+        with open(path) as f:
+            start = time.perf_counter()
+            reader(f, columns)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def projectionSpeedup(path, columns):
+    '''
+    Speedup of readDataTable over the legacy reader when only the given
+    columns are read, best of three runs each.
+    '''
+    return bestTime(legacyReadDataFile, path, columns) / bestTime(lambda f, c: readDataTable(f, c, ""), path, columns)
+
+
+def timeReader(name, reader):
+    start = time.perf_counter()
+    reader()
+    elapsed = time.perf_counter() - start
+    print(f"{name.ljust(40)} {elapsed:8.3f} s")
+    return elapsed
+
+
+def main():
+    parser = OptionParser(usage="readBenchmark.py [options]")
+    parser.add_option("--rows", action="store", dest="rows", type="int", default=100000, help="Number of data rows")
+    parser.add_option("--cols", action="store", dest="cols", type="int", default=30, help="Number of data columns")
+    parser.add_option("--columns", action="store", dest="columns", type="string", default="0,1,2", help="Projection used for the projected runs")
+    opts, args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    for suffix, delimiter in [(".txt", " "), (".csv", ";")]:
+        path = os.path.join(tmpdir, f"bench{suffix}")
+        writeDataFile(path, opts.rows, opts.cols, delimiter)
+        print(f"\n{opts.rows} rows x {opts.cols} columns, {os.path.getsize(path) / 1e6:.1f} MB ({suffix})")
+
+        for columns in ["", opts.columns]:
+            label = "all columns" if columns == "" else f"columns {columns}"
+            with open(path) as f:
+                legacy = timeReader(f"legacy reader, {label}", lambda: legacyReadDataFile(f, columns))
+            with open(path) as f:
+                bulk = timeReader(f"readDataTable, {label}", lambda: readDataTable(f, columns, ""))
+            print(f"{'speedup'.ljust(40)} {legacy / bulk:8.1f} x")
+
+        os.remove(path)
+    os.rmdir(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+'''
+Times scatterPlot, from building the figure to writing the PDF, for
+growing point counts. The original per-point implementation is timed for
+the counts up to --legacy-max.
+
+Run from the repository root: python calplotTest/scatterBenchmark.py
+'''
+import os
+import tempfile
+import time
+from optparse import OptionParser
+
+import numpy as np
+from matplotlib import cm
+from matplotlib.markers import MarkerStyle
+
+from calplotCore.plot import scatterPlot, setUpFonts, processOutput, holdsTextEngine
+
+
+@holdsTextEngine
+def legacyScatterPlot(xdata, ydata, **kwargs):
+    ax = setUpFonts(kwargs)
+    for i in range(len(xdata)):
+        thisColor = cm.Blues(1 * (float(i) / len(xdata)))
+        thisMarker = MarkerStyle.filled_markers[i % len(MarkerStyle.filled_markers)]
+        ax.scatter(xdata[i], ydata[i], marker=thisMarker, color=thisColor, edgecolors="black")
+    processOutput(ax, kwargs)
+
+
+def timePlot(name, plot):
+    start = time.perf_counter()
+    plot()
+    elapsed = time.perf_counter() - start
+    print(f"{name.ljust(40)} {elapsed:8.3f} s")
+    return elapsed
+
+
+def main():
+    parser = OptionParser(usage="scatterBenchmark.py [options]")
+    parser.add_option("--points", action="store", dest="points", type="string", default="1000,100000,1000000", help="Comma separated point counts")
+    parser.add_option("--legacy-max", action="store", dest="legacyMax", type="int", default=1000, help="Largest point count to time with the original implementation")
+    parser.add_option("--text-engine", action="store", dest="textEngine", type="string", default="mathtext", help="Text engine used for the plots")
+    opts, args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    outfile = os.path.join(tempfile.mkdtemp(), "scatter.pdf")
+    for points in [int(p) for p in opts.points.split(",")]:
+        xdata = rng.random(points)
+        ydata = rng.random(points)
+        kwargs = {"filename": outfile, "textEngine": opts.textEngine, "pointLegend": False}
+        print(f"\n{points} points")
+
+        if points <= opts.legacyMax:
+            legacy = timePlot("per-point scatter", lambda: legacyScatterPlot(xdata, ydata, **kwargs))
+        new = timePlot("scatterPlot", lambda: scatterPlot(xdata, ydata, **kwargs))
+        print(f"{'PDF size'.ljust(40)} {os.path.getsize(outfile) / 1e6:8.1f} MB")
+        if points <= opts.legacyMax:
+            print(f"{'speedup'.ljust(40)} {legacy / new:8.1f} x")
+
+    os.remove(outfile)
+    os.rmdir(os.path.dirname(outfile))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+'''
+Records the start-up cost of the command line entry points using
+python -X importtime.
+
+Run from the repository root: python calplotTest/startupBenchmark.py
+'''
+import statistics
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+ENTRY_POINTS = [["calmerge.py", "--print-names", "calplotTest/testfiles/data.txt"],
+                ["calmerge.py", "--help"],
+                ["calplot.py", "--help"],
+                ["calbatch.py", "--help"]]
+
+
+def parseImportTimes(stderr):
+    imports = []
+    for l in stderr.splitlines():
+        if not l.startswith("import time:") or "self [us]" in l:
+            continue
+        selfTime, cumulative, name = l[len("import time:"):].split("|")
+        imports.append((int(cumulative), int(selfTime), name.strip()))
+    return imports
+
+
+def measure(command, repeat):
+    wallTimes = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime"] + command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        wallTimes.append(time.perf_counter() - start)
+    return statistics.median(wallTimes), parseImportTimes(result.stderr)
+
+
+def main():
+    parser = OptionParser(usage="startupBenchmark.py [options]")
+    parser.add_option("--repeat", action="store", dest="repeat", type="int", default=5, help="Number of runs per entry point, the median wall time is reported")
+    parser.add_option("--top", action="store", dest="top", type="int", default=5, help="Number of most expensive imports to list per entry point")
+    opts, args = parser.parse_args()
+
+    baseline, baseImports = measure(["-c", "pass"], opts.repeat)
+    print(f"{'python -c pass'.ljust(60)} {baseline * 1000:8.1f} ms wall")
+
+    for command in ENTRY_POINTS:
+        wall, imports = measure(command, opts.repeat)
+        importTotal = sum(i[1] for i in imports) / 1000
+        print(f"\n{' '.join(command).ljust(60)} {wall * 1000:8.1f} ms wall {importTotal:8.1f} ms imports")
+        for cumulative, selfTime, name in sorted(imports, reverse=True)[:opts.top]:
+            print(f"    {name.ljust(56)} {cumulative / 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import unittest
+import shutil
+import tempfile
+from unittest import mock
+import numpy as np
+from matplotlib import cbook, mlab
+from calplotCore.cache import FileCache
+from calplotCore.stats import boxStatistics, QuantileSketch, violinStatistics, cachedViolinStatistics, violinStatisticsKey, violinStatsCache, Reservoir
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.samples = [rng.standard_normal(100000), rng.lognormal(0.0, 1.0, 100000), rng.integers(0, 10, 1000).astype(float)]
+
+    def rank(self, values, v):
+        return np.searchsorted(np.sort(values), v) / len(values)
+
+    def testBoxStatistics(self):
+        for values in self.samples:
+            expected = cbook.boxplot_stats(values)[0]
+            stats = boxStatistics(values)
+            for key in ["med", "q1", "q3", "iqr", "whislo", "whishi", "mean"]:
+                self.assertAlmostEqual(stats[key], expected[key])
+            np.testing.assert_array_equal(np.sort(stats["fliers"]), np.sort(expected["fliers"]))
+
+    def testMissingValues(self):
+        stats = boxStatistics([1.0, np.nan, 3.0])
+        self.assertEqual(stats["med"], 2.0)
+        self.assertEqual(stats["mean"], 2.0)
+        self.assertTrue(np.isnan(boxStatistics([np.nan])["med"]))
+        self.assertTrue(np.isnan(QuantileSketch().boxStatistics()["med"]))
+
+    def testQuantileSketch(self):
+        for values in self.samples:
+            sketch = QuantileSketch()
+            for chunk in np.array_split(values, 37):
+                sketch.add(chunk)
+
+            self.assertEqual(len(sketch), len(values))
+            self.assertLess(len(sketch.means), 2 * sketch.compression)
+            self.assertAlmostEqual(sketch.mean(), values.mean())
+            self.assertEqual(sketch.minimum, values.min())
+            self.assertEqual(sketch.maximum, values.max())
+
+            stats = sketch.boxStatistics()
+            exact = boxStatistics(values)
+            for key in ["med", "q1", "q3"]:
+                self.assertLess(abs(self.rank(values, stats[key]) - self.rank(values, exact[key])), 0.005)
+
+    def testMergeQuantileSketches(self):
+        values = self.samples[1]
+        first = QuantileSketch()
+        first.add(values[:30000])
+        second = QuantileSketch()
+        second.add(values[30000:])
+        first.merge(second)
+        first.merge(QuantileSketch())
+
+        self.assertEqual(len(first), len(values))
+        self.assertEqual(first.maximum, values.max())
+        for q in [0.01, 0.25, 0.5, 0.75, 0.99]:
+            self.assertLess(abs(self.rank(values, first.quantiles([q])[0]) - q), 0.005)
+
+    def testViolinStatistics(self):
+        for values in self.samples:
+            expected = cbook.violin_stats(values, lambda x, coords: mlab.GaussianKDE(x, 0.1).evaluate(coords), points=100)[0]
+            stats = violinStatistics(values, points=100, bandwidth=0.1)
+            for key in ["mean", "median", "min", "max"]:
+                self.assertAlmostEqual(stats[key], expected[key])
+            np.testing.assert_allclose(stats["coords"], expected["coords"])
+            self.assertLess(np.abs(stats["vals"] - expected["vals"]).max(), 1e-3 * expected["vals"].max())
+
+        self.assertEqual(len(violinStatistics([])["vals"]), 0)
+        np.testing.assert_array_equal(violinStatistics([2.0, 2.0])["vals"], np.zeros(100))
+
+    def testCachedViolinStatistics(self):
+        cachedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cachedir)
+        cache = FileCache(cachedir)
+        values = self.samples[0]
+
+        stats = cachedViolinStatistics(values, cache=cache)
+        self.assertIs(cachedViolinStatistics(values.copy(), cache=cache), stats)
+        self.assertIsNot(cachedViolinStatistics(values, bandwidth=0.2), stats)
+
+        violinStatsCache.clear()
+        loaded = cachedViolinStatistics(values, cache=cache)
+        self.assertIsNot(loaded, stats)
+        for key in stats:
+            np.testing.assert_array_equal(loaded[key], stats[key])
+
+    def testViolinStatisticsKeyIncludesCode(self):
+        values = self.samples[2]
+        key = violinStatisticsKey(values, 100, 0.1)
+        with mock.patch("calplotCore.stats.sourceDigest", return_value="changed"):
+            self.assertNotEqual(violinStatisticsKey(values, 100, 0.1), key)
+
+    def testReservoir(self):
+        counts = np.zeros(200)
+        for seed in range(2000):
+            reservoir = Reservoir(10, np.random.default_rng(seed))
+            for chunk in np.array_split(np.arange(200), 9):
+                reservoir.add(chunk)
+            sample = reservoir.sample()[0]
+            self.assertEqual(len(set(sample)), 10)
+            counts[sample] += 1
+
+        # Every row is kept with probability 10 / 200
+        self.assertLess(np.abs(counts - 100).max(), 50)
+        self.assertLess(abs(counts[:100].sum() - counts[100:].sum()), 500)
+
+    def testReservoirChunking(self):
+        whole = Reservoir(25, np.random.default_rng(1))
+        whole.add(np.arange(1000), np.arange(1000) * 2.0)
+        chunked = Reservoir(25, np.random.default_rng(1))
+        for chunk in np.array_split(np.arange(1000), 17):
+            chunked.add(chunk, chunk * 2.0)
+
+        for a, b in zip(whole.sample(), chunked.sample()):
+            np.testing.assert_array_equal(a, b)
+        np.testing.assert_array_equal(whole.sample()[1], whole.sample()[0] * 2.0)
+
+        small = Reservoir(25, np.random.default_rng(1))
+        small.add(np.arange(5))
+        np.testing.assert_array_equal(small.sample()[0], np.arange(5))
+        self.assertEqual(Reservoir(5, np.random.default_rng(1)).sample(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from calplotCore.workload import parseWorkloadKey, canonicalWorkloadKey, readableWorkloadName, workloadNumber, workloadType, selectedWorkloadType
+
+
+class Test(unittest.TestCase):
+
+    def testParseWorkloadKey(self):
+        wlkey = parseWorkloadKey("4-t-h-07")
+        self.assertEqual(wlkey, ("4-t", "h", "07", ""))
+
+        wlkey = parseWorkloadKey("t-m-12-s6-bench")
+        self.assertEqual(wlkey.prefix, "t")
+        self.assertEqual(wlkey.type, "m")
+        self.assertEqual(wlkey.number, "12")
+        self.assertEqual(wlkey.suffix, "s6-bench")
+
+        self.assertEqual(parseWorkloadKey("fair07"), ("fair07", "", "", ""))
+        self.assertEqual(workloadType("x-l-3"), "l")
+        self.assertEqual(workloadType("10"), "")
+        self.assertEqual(workloadType("1-b-foo-03"), "b")
+        self.assertEqual(workloadType("4-t-n-07"), "n")
+        self.assertEqual(workloadType("x-h-c-3"), "h")
+
+    def testSelectedWorkloadType(self):
+        for key, wlType in [("1-c-h-03", "c"), ("1-n-a-3", "n"), ("4-t-h-07", "t"), ("t-m-12-s6-bench", "m"), ("1-b-foo-03", "b"), ("10", "")]:
+            self.assertEqual(selectedWorkloadType(key), wlType)
+            if key != "10":
+                self.assertEqual(selectedWorkloadType(key), key.split("-")[1])
+
+    def testCanonicalWorkloadKey(self):
+        self.assertEqual(canonicalWorkloadKey("4-t-h-7"), "4-t-h-07")
+        self.assertEqual(canonicalWorkloadKey("results-4-t-h-12"), "4-t-h-12")
+        self.assertEqual(canonicalWorkloadKey("run-fair03-x"), "fair03")
+        self.assertEqual(canonicalWorkloadKey("other"), "other")
+
+    def testWorkloadNames(self):
+        self.assertEqual(readableWorkloadName("t-h-07-bzip2x"), "h-07_bzip2")
+        self.assertEqual(readableWorkloadName("t-h-07-s6-mcf"), "h-07_s6-mcf")
+        self.assertEqual(workloadNumber("4-t-h-07"), "07")
+        self.assertEqual(workloadNumber("t-h-07-bzip2x"), "bzip2x")
+        self.assertEqual(workloadNumber("fair07"), "fair07")
+
+    def baselineReadableName(self, key):
+        wlbmlist = key.split("-")
+        wl = f"{wlbmlist[1]}-{wlbmlist[2]}"
+        if wlbmlist[-2] == "s6":
+            bm = f"{wlbmlist[-2]}-{wlbmlist[-1]}"
+        else:
+            bm = wlbmlist[-1][:-1]
+        return f"{wl}_{bm}"
+
+    def testReadableNamesMatchPositionalRule(self):
+        for key in ["t-h-07-bzip2x", "t-h-07-s6-mcf", "4-h-mcf-07", "4-t-h-07-x", "1-b-foo-03", "4-t-h-07", "a-b-c"]:
+            self.assertEqual(readableWorkloadName(key), self.baselineReadableName(key))
+        self.assertEqual(readableWorkloadName("4-h-mcf-07"), "h-mcf_0")
+        self.assertEqual(readableWorkloadName("4-t-h-07-x"), "t-h_")
+
+
+if __name__ == "__main__":
+    unittest.main()
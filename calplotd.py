@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+'''
+Render daemon for calplot.
+
+The daemon imports matplotlib and sets up the fonts once, then renders the
+plots requested over a local Unix socket. Run calplot.py with
+--daemon-socket (or the CALPLOT_DAEMON_SOCKET environment variable) to
+forward a plot to the daemon instead of rendering it in a new interpreter.
+
+Each request is a single line of JSON with the client's working directory
+and calplot.py arguments. The reply is a single line of JSON with the
+status, the output calplot printed and the absolute path of the plot.
+'''
+
+import io
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import time
+from contextlib import redirect_stdout
+from optparse import OptionParser
+
+from calplotCore import fatal, setTexCache
+
+
+def defaultSocketPath():
+    return os.path.join(tempfile.gettempdir(), f"calplotd-{os.getuid()}.sock")
+
+
+def sendRequest(socketPath, request):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socketPath)
+        s.sendall(json.dumps(request).encode() + b"\n")
+        s.shutdown(socket.SHUT_WR)
+        with s.makefile("rb") as f:
+            reply = f.readline()
+    if reply == b"":
+        raise ConnectionError(f"The daemon at {socketPath} closed the connection without replying")
+    return json.loads(reply)
+
+
+def renderRequest(request):
+    from calbatch import runPlotArgs
+    from calplot import parseArgs
+
+    oldCwd = os.getcwd()
+    os.chdir(request["cwd"])
+    try:
+        # The daemon renders the plot itself, even if the request or the
+        # environment names a daemon socket
+        args = request["args"] + ["--daemon-socket", ""]
+
+        outfile = None
+        try:
+            with redirect_stdout(io.StringIO()):
+                opts, positional, datafiles = parseArgs(args)
+            for f in datafiles:
+                f.close()
+            if opts.outfile is None:
+                return {"status": -1, "output": "\nERROR: calplotd can only render to files, use --outfile\n", "outfile": None}
+            outfile = os.path.abspath(opts.outfile)
+        except SystemExit:
+            pass
+
+        start = time.perf_counter()
+        success, output = runPlotArgs(args)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(oldCwd)
+
+    return {"status": 0 if success else -1, "output": output, "outfile": outfile, "seconds": elapsed}
+
+
+class PlotRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        description = "invalid request"
+        try:
+            request = json.loads(self.rfile.readline())
+            if "command" in request:
+                description = request["command"]
+                reply = {"status": 0, "output": ""}
+                if request["command"] == "stop":
+                    reply["output"] = "Stopping calplotd\n"
+                    self.server.stopRequested = True
+            else:
+                description = " ".join(request["args"])
+                reply = renderRequest(request)
+        except Exception as e:
+            reply = {"status": -1, "output": f"\nERROR: calplotd could not handle the request: {type(e).__name__}: {e}\n"}
+
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+        if not self.server.quiet:
+            print(f"{description}: status {reply['status']}", flush=True)
+
+
+class PlotDaemon(socketserver.UnixStreamServer):
+    '''
+    Serves one request at a time. calplot changes the working directory and
+    captures stdout while rendering, so requests must not overlap.
+    '''
+
+    def __init__(self, socketPath, quiet=False):
+        self.quiet = quiet
+        self.stopRequested = False
+        if os.path.exists(socketPath):
+            try:
+                sendRequest(socketPath, {"command": "ping"})
+                fatal(f"A daemon is already listening on {socketPath}")
+            except (ConnectionError, OSError):
+                os.remove(socketPath)
+
+        oldMask = os.umask(0o077)
+        try:
+            socketserver.UnixStreamServer.__init__(self, socketPath, PlotRequestHandler)
+        finally:
+            os.umask(oldMask)
+
+    def serveUntilStopped(self):
+        while not self.stopRequested:
+            self.handle_request()
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def warmUp():
+    '''
+    Import matplotlib and render some text once so that the fonts (and the
+    LaTeX set-up when usetex works) are loaded before the first request.
+    '''
+    import matplotlib
+    from matplotlib.figure import Figure
+    from calplotCore import TEXT_ENGINES
+    import calplotCore.plot as plot
+
+    matplotlib.use("Agg")
+    for textEngine in TEXT_ENGINES:
+        try:
+            plot.setUpMatplotlib(textEngine)
+            fig = Figure(figsize=(1, 1))
+            fig.add_subplot(111).set_xlabel("calplot 0123456789")
+            fig.savefig(io.BytesIO(), format="pdf")
+        except Exception as e:
+            print(f"Warm-up with the {textEngine} text engine failed: {e}")
+
+
+def parseArgs():
+    parser = OptionParser(usage="calplotd.py [options]")
+
+    parser.add_option("--socket", action="store", dest="socket", type="string", default=defaultSocketPath(), help=f"Path of the Unix socket to listen on (Default: {defaultSocketPath()})")
+    parser.add_option("--stop", action="store_true", dest="stop", default=False, help="Stop the daemon listening on the socket")
+    parser.add_option("--quiet", action="store_true", dest="quiet", default=False, help="Do not print a line per request")
+    parser.add_option("--tex-cache", action="store", dest="texCache", type="string", default="", help="Directory for rendered LaTeX snippets, requests can only use this directory")
+
+    opts, args = parser.parse_args()
+    if args != []:
+        fatal("calplotd.py does not take any positional arguments")
+
+    return opts
+
+
+def main():
+    opts = parseArgs()
+
+    if opts.stop:
+        try:
+            print(sendRequest(opts.socket, {"command": "stop"})["output"], end="")
+        except OSError as e:
+            fatal(f"Could not connect to the daemon at {opts.socket}: {e}")
+        return
+
+    if opts.texCache != "":
+        setTexCache(opts.texCache)
+    warmUp()
+    server = PlotDaemon(opts.socket, opts.quiet)
+    print(f"calplotd listening on {opts.socket}", flush=True)
+    try:
+        server.serveUntilStopped()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,37 @@ echo "Running plot tests"
 echo
 python calplotTest/plotTest.py
 
+echo
+echo "Running io tests"
+echo
+python calplotTest/ioTest.py
+
+echo
+echo "Running workload key tests"
+echo
+python calplotTest/workloadTest.py
+
+echo
+echo "Running statistics tests"
+echo
+python calplotTest/statsTest.py
+
 echo
 echo "Running merge tests"
 echo
 python calplotTest/mergeTest.py
+
+echo
+echo "Running batch tests"
+echo
+python calplotTest/batchTest.py
+
+echo
+echo "Running memory tests"
+echo
+python calplotTest/memoryTest.py
+
+echo
+echo "Running daemon tests"
+echo
+python calplotTest/daemonTest.py